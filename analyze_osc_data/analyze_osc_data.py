@@ -19,8 +19,14 @@ and anlyze with:
 # Example command lines for example data files:
 # python .\analyze_osc_data.py -c .\ad7385-2MSPS-M2K-1kHz-4V-p-p-2.5V-offset.csv -b 16 -r 2000000 -f 1000 -fs 5.0
 # python .\analyze_osc_data.py -c .\ltc2387-18-10MSPS-M2K-10kHz-8V-p-p.csv -b 18 -r 10000000 -f 10000 -fs 8.192
+# Batch mode, every CSV in a directory (or matching a glob) across worker processes,
+# plots off, one row per file in the summary table (.csv or .parquet):
+# python .\analyze_osc_data.py -d .\lot_1234\ -b 18 -r 10000000 -f 10000 -fs 8.192 -o summary.csv -j 8
 
 import argparse
+import glob
+import os
+import time
 import matplotlib
 matplotlib.use('qt5agg')  # or 'tkagg', 'wxagg', etc.
 
@@ -29,232 +35,369 @@ import genalyzer as gn
 import matplotlib.pyplot as pl
 import pandas as pd
 
+from concurrent.futures import ProcessPoolExecutor
 from matplotlib.patches import Rectangle as MPRect
 from matplotlib import pyplot as plt
 
 from pathlib import Path
 
-from save_for_pscope import save_for_pscope
+from capture_loader import CAPTURE_SUFFIXES, iter_capture_chunks, load_capture
+from save_for_pscope import PscopeWriter, save_for_pscope
 from scipy import signal
 from sin_params import sin_params
 
-# Collect and parse arguments
-parser = argparse.ArgumentParser(description="Analyze csv data from IIO Oscilloscope (or other source)")
-parser.add_argument(
-    "-c",
-    default=['ad7385-2MSPS-M2K-1kHz-4V-p-p-2.5V-offset.csv'],
-    help="-c (arg) csv filename to analyze eg: 'my_osc_file.csv'",
-    action="store",
-    nargs="*",
-)
-
-parser.add_argument(
-    "-b",
-    default=[16],
-    help="-b (arg) ADC resolution (bits) eg: 16",
-    action="store",
-    nargs="*",
-)
-
-parser.add_argument(
-    "-r",
-    default=[2000000],
-    help="-r (arg) sample rate in samples per second eg: 2000000",
-    action="store",
-    nargs="*",
-)
-
-parser.add_argument(
-    "-f",
-    default=[1000],
-    help="-f (arg) fundamental frequency in Hz eg: 1000",
-    action="store",
-    nargs="*",
-)
-
-parser.add_argument(
-    "-fs",
-    default=[5.0],
-    help="-fs (arg) adc peak-to-peak range eg: 5.0",
-    action="store",
-    nargs="*",
-)
-
-parser.add_argument(
-    "-plt",
-    default=["t"],
-    help="-plt (arg) do plots, t or f eg: t",
-    action="store",
-    nargs="*",
-)
-
-
-
-args = parser.parse_args()
-filename = args.c[0]
-qres = int(args.b[0])
-sampling_frequency = float(args.r[0])
-fund_freq = args.f[0]
-fsr = float(args.fs[0])
-do_plots = {'t':True, 'f':False}[args.plt[0]]
-
-filename_with_path = Path(__file__).with_name(filename)
-
-print("matplotlib version: ", matplotlib.__version__)
-print("analyzing file: ", filename)
-
-dataframe = pd.read_csv(filename_with_path, header=None)
-data = dataframe[0].tolist()
-
-# Quick hack for Pscope, not robust (bipolar device with a small positive offset
-#  and very low signal level could detect as unipolar) 
-if min(data) < 0:
-    is_bipolar = True
-    print("Data is bipolar...")
-else:
-    is_bipolar = False
-    print("Data seems to be unipolar...")
-
-print("Saving out .adc file for Pscope...")    
-save_for_pscope(filename_with_path.with_suffix('.adc'), qres, is_bipolar, len(data), "DC0000", "LTC1111", data, data, )
-
-nfft = len(data)
-navg = 1
-data_nodc = data - np.average((data)) # Strip out DC
-voltage = (data_nodc * fsr) / (2.0**qres)
-
-# Plot analog waveform
-if do_plots is True:
-    pl.figure(1)
-    plt.clf()
-    pl.title("Raw ADC codes")
-    pl.plot(data)
-    pl.tight_layout()
-    pl.show()
-
-# Plot waveform converted to voltage
-if do_plots is True:
-    x = np.arange(0, len(data))
-    plt.figure(2)
-    plt.clf()
-    plt.title("ADC Voltage, from raw codes, Vref (DC removed)")
-    plt.plot(x, voltage)
-    pl.tight_layout()
-    plt.show()
-
-f, Pxx_spec = signal.periodogram(voltage , sampling_frequency, window = "blackman", scaling = "spectrum")
-Pxx_abs = np.sqrt(Pxx_spec)
-
-if do_plots is True:
-    plt.figure(3)
-    plt.clf()
-    plt.title("FFT from SciPy periodogram, spectrum scaling")
-    plt.semilogy(f, Pxx_abs)
-    plt.ylim([1e-7, 5])
-    plt.xlabel("frequency [Hz]")
-    plt.ylabel("Voltage(V)")
-    pl.tight_layout()
-    plt.draw()
-    plt.pause(0.05)
-    plt.show()
-
-
-
-# Saving time_domaine twice - workaround because save_for_pscope expects two channels
-# save_for_pscope("ltc2387_data.adc", 18, True, len(data), "DC0000", "LTC1111", data, data, )
-
-harmonics, snr, thd, sinad, enob, sfdr, floor = sin_params(data)
-print("##########################################################")
-print("################# Sin Params Results #####################")
-print("##########################################################")
-print("A.C. Performance parameters (ONLY valid for a sine input):")
-print("Harmonics:", harmonics)
-print("snr: ", snr)
-print("THD: ", thd)
-print("Sinad: ", sinad)
-print("ENOB: ", enob)
-print("SFDR: ", sfdr)
-print("Noise Floor: ", floor)
-print("\n\n")
-
-
-# Set up Genalyzer parameters
-
-code_fmt = gn.CodeFormat.TWOS_COMPLEMENT  # ADC codes format
-rfft_scale = gn.RfftScale.DBFS_SIN  # FFT scale
-# window = gn.Window.NO_WINDOW  # FFT window
-window = gn.Window.BLACKMAN_HARRIS  # FFT window
-
-ssb_fund = 4  # Single side bin fundamental
-ssb_rest = 5
-# If we are not windowing then choose the closest coherent bin for fundamental
-if gn.Window.NO_WINDOW == window:
-    fund_freq = gn.coherent(nfft, sampling_frequency, fund_freq)
-    ssb_fund = 0
-    ssb_rest = 0
-
-# Compute FFT
-fft_cplx = gn.rfft(np.array(data), qres, navg, nfft, window, code_fmt, rfft_scale)
-# Compute frequency axis
-freq_axis = gn.freq_axis(nfft, gn.FreqAxisType.REAL, sampling_frequency)
-# Compute FFT in db
-fft_db = gn.db(fft_cplx)
-
-# Fourier analysis configuration
-key = 'fa'
-gn.mgr_remove(key)
-gn.fa_create(key)
-gn.fa_analysis_band(key, "fdata*0.0", "fdata*1.0")
-gn.fa_fixed_tone(key, 'A', gn.FaCompTag.SIGNAL, fund_freq, ssb_fund)
-gn.fa_hd(key, 4)
-gn.fa_ssb(key, gn.FaSsb.DEFAULT, ssb_rest)
-gn.fa_ssb(key, gn.FaSsb.DC, -1)
-gn.fa_ssb(key, gn.FaSsb.SIGNAL, -1)
-gn.fa_ssb(key, gn.FaSsb.WO, -1)
-gn.fa_fsample(key, sampling_frequency)
-
-print("##########################################################")
-print("################# Genalyzer Results #####################")
-print("##########################################################")
-
-# print(gn.fa_preview(key, False))
-
-# Fourier analysis results
-fft_results = gn.fft_analysis(key, fft_cplx, nfft)
-# compute THD. Double-check the math, thd_rss is with respect to full-scale
-# so subtracting full-scale amplitude
-thd = 20*np.log10(fft_results['thd_rss']) - fft_results['A:mag_dbfs']
-print("\nFourier Analysis Results:")
-print("\nFrequency, Phase and Amplitude for Harmonics:\n")
-for k in ['A:freq', 'A:mag_dbfs', 'A:phase',
-          '2A:freq', '2A:mag_dbfs', '2A:phase',
-          '3A:freq', '3A:mag_dbfs', '3A:phase',
-          '4A:freq', '4A:mag_dbfs', '4A:phase']:
-    print("{:20s}{:20.6f}".format(k, fft_results[k]))
-print("\nFrequency, Phase and Amplitude for Noise:\n")
-for k in ['wo:freq','wo:mag_dbfs', 'wo:phase']:
-    print("{:20s}{:20.6f}".format(k, fft_results[k]))
-print("\nSNR and THD:")
-for k in ['snr', 'fsnr']:
-    print("{:20s}{:20.6f}".format(k, fft_results[k]))
-print("{:20s}{:20.6f}".format("thd", thd))
-
-# Plot FFT
-if do_plots is True:
-    pl.figure(4)
-    fftax = pl.subplot2grid((1, 1), (0, 0), rowspan=2, colspan=2)
-    pl.title("Genalyzer FFT")
-    pl.plot(freq_axis, fft_db)
-    pl.grid(True)
-    # pl.xlim(freq_axis[0], 20)
-    pl.ylim(-160.0, 20.0)
-    annots = gn.fa_annotations(fft_results)
-    
-    for x, y, label in annots["labels"]:
-        pl.annotate(label, xy=(x, y), ha='center', va='bottom')
-    for box in annots["tone_boxes"]:
-        fftax.add_patch(MPRect((box[0], box[1]), box[2], box[3],
-                               ec='pink', fc='pink', fill=True, hatch='x'))
-    
-    pl.tight_layout()
-    pl.show()
+
+def parse_args():
+    # Collect and parse arguments
+    parser = argparse.ArgumentParser(description="Analyze csv data from IIO Oscilloscope (or other source)")
+    parser.add_argument(
+        "-c",
+        default=['ad7385-2MSPS-M2K-1kHz-4V-p-p-2.5V-offset.csv'],
+        help="-c (arg) csv, .npy or raw binary (.bin/.dat/.raw) filename(s) to analyze, relative to this script's directory eg: 'my_osc_file.csv'",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "-b",
+        default=[16],
+        help="-b (arg) ADC resolution (bits) eg: 16",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "-r",
+        default=[2000000],
+        help="-r (arg) sample rate in samples per second eg: 2000000",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "-f",
+        default=[1000],
+        help="-f (arg) fundamental frequency in Hz eg: 1000",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "-fs",
+        default=[5.0],
+        help="-fs (arg) adc peak-to-peak range eg: 5.0",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "-plt",
+        default=["t"],
+        help="-plt (arg) do plots, t or f eg: t",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "--pscope",
+        help="--pscope also save each capture as a PScope .adc file next to it",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-d",
+        default=[],
+        help="-d (arg) batch mode: directories (every .csv/.npy/.bin/.dat/.raw inside) or globs eg: 'lot_1234/*.csv'",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "-o",
+        default=["summary.csv"],
+        help="-o (arg) batch mode summary table, .csv or .parquet eg: summary.csv",
+        action="store",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "-j",
+        default=[os.cpu_count()],
+        help="-j (arg) batch mode worker processes eg: 8",
+        action="store",
+        nargs="*",
+    )
+
+    return parser.parse_args()
+
+
+def analyze_file(filename_with_path, qres, sampling_frequency, fund_freq, fsr,
+                 do_plots=True, verbose=True, pscope=False):
+    """Runs the full analysis on one capture file, saving a PScope .adc copy
+    next to it if pscope is set.
+    Returns a dictionary of the results, one entry per summary column.
+    """
+    vprint = print if verbose else (lambda *args: None)
+
+    vprint("matplotlib version: ", matplotlib.__version__)
+    vprint("analyzing file: ", filename_with_path)
+
+    load_start = time.perf_counter()
+    data = load_capture(filename_with_path, qres)
+    load_time = time.perf_counter() - load_start
+    vprint("loaded {0:d} samples in {1:.3f} s".format(len(data), load_time))
+    # Memory-mapped .npy/raw captures are scanned (and exported below) a
+    # chunk at a time, so those passes never need the whole file resident
+    streamed = isinstance(data, np.memmap)
+    if streamed:
+        min_code = max_code = None
+        for chunk in iter_capture_chunks(filename_with_path, qres):
+            lo, hi = int(chunk.min()), int(chunk.max())
+            min_code = lo if min_code is None else min(min_code, lo)
+            max_code = hi if max_code is None else max(max_code, hi)
+    else:
+        min_code, max_code = int(data.min()), int(data.max())
+
+    # Quick hack for Pscope, not robust (bipolar device with a small positive offset
+    #  and very low signal level could detect as unipolar) 
+    if min_code < 0:
+        is_bipolar = True
+        vprint("Data is bipolar...")
+    else:
+        is_bipolar = False
+        vprint("Data seems to be unipolar...")
+
+    if pscope and streamed:
+        vprint("Saving out .adc file for Pscope...")    
+        with PscopeWriter(Path(filename_with_path).with_suffix('.adc'), qres, is_bipolar, 2, "DC0000", "LTC1111") as adc_file:
+            for chunk in iter_capture_chunks(filename_with_path, qres):
+                adc_file.write(chunk, chunk)
+    elif pscope:
+        vprint("Saving out .adc file for Pscope...")    
+        save_for_pscope(Path(filename_with_path).with_suffix('.adc'), qres, is_bipolar, len(data), "DC0000", "LTC1111", data, data, )
+
+    nfft = len(data)
+    navg = 1
+    data_nodc = data - np.average((data)) # Strip out DC
+    voltage = (data_nodc * fsr) / (2.0**qres)
+
+    # Plot analog waveform
+    if do_plots is True:
+        pl.figure(1)
+        plt.clf()
+        pl.title("Raw ADC codes")
+        pl.plot(data)
+        pl.tight_layout()
+        pl.show()
+
+    # Plot waveform converted to voltage
+    if do_plots is True:
+        x = np.arange(0, len(data))
+        plt.figure(2)
+        plt.clf()
+        plt.title("ADC Voltage, from raw codes, Vref (DC removed)")
+        plt.plot(x, voltage)
+        pl.tight_layout()
+        plt.show()
+
+    if do_plots is True:
+        f, Pxx_spec = signal.periodogram(voltage , sampling_frequency, window = "blackman", scaling = "spectrum")
+        Pxx_abs = np.sqrt(Pxx_spec)
+
+        plt.figure(3)
+        plt.clf()
+        plt.title("FFT from SciPy periodogram, spectrum scaling")
+        plt.semilogy(f, Pxx_abs)
+        plt.ylim([1e-7, 5])
+        plt.xlabel("frequency [Hz]")
+        plt.ylabel("Voltage(V)")
+        pl.tight_layout()
+        plt.draw()
+        plt.pause(0.05)
+        plt.show()
+
+
+
+    # Saving time_domaine twice - workaround because save_for_pscope expects two channels
+    # save_for_pscope("ltc2387_data.adc", 18, True, len(data), "DC0000", "LTC1111", data, data, )
+
+    harmonics, snr, thd, sinad, enob, sfdr, floor = sin_params(data)
+    vprint("##########################################################")
+    vprint("################# Sin Params Results #####################")
+    vprint("##########################################################")
+    vprint("A.C. Performance parameters (ONLY valid for a sine input):")
+    vprint("Harmonics:", harmonics)
+    vprint("snr: ", snr)
+    vprint("THD: ", thd)
+    vprint("Sinad: ", sinad)
+    vprint("ENOB: ", enob)
+    vprint("SFDR: ", sfdr)
+    vprint("Noise Floor: ", floor)
+    vprint("\n\n")
+
+    results = {"file": str(filename_with_path),
+               "samples": nfft,
+               "load_s": load_time,
+               "min_code": min_code,
+               "max_code": max_code,
+               "is_bipolar": is_bipolar,
+               "fund_bin": harmonics[1][1],
+               "sp_snr": snr,
+               "sp_thd": thd,
+               "sp_sinad": sinad,
+               "sp_enob": enob,
+               "sp_sfdr": sfdr,
+               "sp_floor": floor}
+
+    # Set up Genalyzer parameters
+
+    code_fmt = gn.CodeFormat.TWOS_COMPLEMENT  # ADC codes format
+    rfft_scale = gn.RfftScale.DBFS_SIN  # FFT scale
+    # window = gn.Window.NO_WINDOW  # FFT window
+    window = gn.Window.BLACKMAN_HARRIS  # FFT window
+
+    ssb_fund = 4  # Single side bin fundamental
+    ssb_rest = 5
+    # If we are not windowing then choose the closest coherent bin for fundamental
+    if gn.Window.NO_WINDOW == window:
+        fund_freq = gn.coherent(nfft, sampling_frequency, fund_freq)
+        ssb_fund = 0
+        ssb_rest = 0
+
+    # Compute FFT
+    fft_cplx = gn.rfft(np.asarray(data, dtype=np.int64), qres, navg, nfft, window, code_fmt, rfft_scale)
+    # Compute frequency axis
+    freq_axis = gn.freq_axis(nfft, gn.FreqAxisType.REAL, sampling_frequency)
+    # Compute FFT in db
+    fft_db = gn.db(fft_cplx)
+
+    # Fourier analysis configuration
+    key = 'fa'
+    gn.mgr_remove(key)
+    gn.fa_create(key)
+    gn.fa_analysis_band(key, "fdata*0.0", "fdata*1.0")
+    gn.fa_fixed_tone(key, 'A', gn.FaCompTag.SIGNAL, fund_freq, ssb_fund)
+    gn.fa_hd(key, 4)
+    gn.fa_ssb(key, gn.FaSsb.DEFAULT, ssb_rest)
+    gn.fa_ssb(key, gn.FaSsb.DC, -1)
+    gn.fa_ssb(key, gn.FaSsb.SIGNAL, -1)
+    gn.fa_ssb(key, gn.FaSsb.WO, -1)
+    gn.fa_fsample(key, sampling_frequency)
+
+    vprint("##########################################################")
+    vprint("################# Genalyzer Results #####################")
+    vprint("##########################################################")
+
+    # vprint(gn.fa_preview(key, False))
+
+    # Fourier analysis results
+    fft_results = gn.fft_analysis(key, fft_cplx, nfft)
+    # compute THD. Double-check the math, thd_rss is with respect to full-scale
+    # so subtracting full-scale amplitude
+    thd = 20*np.log10(fft_results['thd_rss']) - fft_results['A:mag_dbfs']
+    vprint("\nFourier Analysis Results:")
+    vprint("\nFrequency, Phase and Amplitude for Harmonics:\n")
+    for k in ['A:freq', 'A:mag_dbfs', 'A:phase',
+              '2A:freq', '2A:mag_dbfs', '2A:phase',
+              '3A:freq', '3A:mag_dbfs', '3A:phase',
+              '4A:freq', '4A:mag_dbfs', '4A:phase']:
+        vprint("{:20s}{:20.6f}".format(k, fft_results[k]))
+    vprint("\nFrequency, Phase and Amplitude for Noise:\n")
+    for k in ['wo:freq','wo:mag_dbfs', 'wo:phase']:
+        vprint("{:20s}{:20.6f}".format(k, fft_results[k]))
+    vprint("\nSNR and THD:")
+    for k in ['snr', 'fsnr']:
+        vprint("{:20s}{:20.6f}".format(k, fft_results[k]))
+    vprint("{:20s}{:20.6f}".format("thd", thd))
+
+    for k in ['A:freq', 'A:mag_dbfs', '2A:mag_dbfs', '3A:mag_dbfs', '4A:mag_dbfs',
+              'wo:mag_dbfs', 'snr', 'fsnr']:
+        results["gn_" + k] = fft_results[k]
+    results["gn_thd"] = thd
+
+    # Plot FFT
+    if do_plots is True:
+        pl.figure(4)
+        fftax = pl.subplot2grid((1, 1), (0, 0), rowspan=2, colspan=2)
+        pl.title("Genalyzer FFT")
+        pl.plot(freq_axis, fft_db)
+        pl.grid(True)
+        # pl.xlim(freq_axis[0], 20)
+        pl.ylim(-160.0, 20.0)
+        annots = gn.fa_annotations(fft_results)
+        
+        for x, y, label in annots["labels"]:
+            pl.annotate(label, xy=(x, y), ha='center', va='bottom')
+        for box in annots["tone_boxes"]:
+            fftax.add_patch(MPRect((box[0], box[1]), box[2], box[3],
+                                   ec='pink', fc='pink', fill=True, hatch='x'))
+        
+        pl.tight_layout()
+        pl.show()
+
+    return results
+
+
+def batch_files(patterns):
+    """Expands directories (to the capture files inside: CSV, .npy and raw
+    binary) and globs into a sorted file list."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(f for f in glob.glob(os.path.join(pattern, "*"))
+                         if os.path.splitext(f)[1].lower() in CAPTURE_SUFFIXES)
+        else:
+            files.extend(glob.glob(pattern))
+    return sorted(set(files))
+
+
+def _analyze_quietly(args):
+    filename, qres, sampling_frequency, fund_freq, fsr, pscope = args
+    try:
+        return analyze_file(filename, qres, sampling_frequency, fund_freq, fsr,
+                            do_plots=False, verbose=False, pscope=pscope)
+    except Exception as e:
+        return {"file": filename, "error": repr(e)}
+
+
+def analyze_batch(files, qres, sampling_frequency, fund_freq, fsr, out_path, workers=None,
+                  pscope=False):
+    """Analyzes many capture files across a process pool, plots off and no
+    .adc copies unless pscope is set.
+    Writes one row per file to out_path (.parquet, otherwise CSV) and
+    returns the summary DataFrame. Files that fail get their error in the
+    "error" column instead of stopping the batch.
+    """
+    jobs = [(f, qres, sampling_frequency, fund_freq, fsr, pscope) for f in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(_analyze_quietly, jobs))
+    summary = pd.DataFrame(rows)
+    if str(out_path).endswith(".parquet"):
+        summary.to_parquet(out_path, index=False)
+    else:
+        summary.to_csv(out_path, index=False)
+    return summary
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    qres = int(args.b[0])
+    sampling_frequency = float(args.r[0])
+    fund_freq = float(args.f[0])
+    fsr = float(args.fs[0])
+    do_plots = {'t':True, 'f':False}[args.plt[0]]
+
+    # -c names are looked up next to this script, -d directories and globs
+    # relative to the working directory
+    capture_files = [Path(__file__).parent / filename for filename in args.c]
+
+    if args.d or len(capture_files) > 1:
+        files = batch_files(args.d) if args.d else [str(f) for f in capture_files]
+        print("Analyzing", len(files), "files...")
+        summary = analyze_batch(files, qres, sampling_frequency, fund_freq, fsr,
+                                args.o[0], int(args.j[0]), args.pscope)
+        print(summary)
+        print("Summary written to", args.o[0])
+    else:
+        analyze_file(capture_files[0], qres, sampling_frequency, fund_freq, fsr, do_plots,
+                     pscope=args.pscope)
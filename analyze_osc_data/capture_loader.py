@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Loaders for captured ADC codes.
+
+Single-column CSV (IIO Oscilloscope exports) is parsed by pandas' C reader
+straight into a typed NumPy array, skipping the Python list round trip;
+CSVs of non-integer values fall back to float64. Raw binary files and .npy
+files are memory mapped, so nothing is read until it is used.
+iter_capture_chunks() streams any of these a block at a time for files too
+large to hold in RAM.
+"""
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+RAW_SUFFIXES = ('.bin', '.dat', '.raw')
+CAPTURE_SUFFIXES = ('.csv', '.npy') + RAW_SUFFIXES
+
+
+def capture_dtype(num_bits):
+    """Smallest signed integer type that holds num_bits codes, whether the
+    converter output is two's complement or offset binary."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_bits < np.iinfo(dtype).bits:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def raw_word_dtype(num_bits, signed=False):
+    """Word size of raw binary dumps: 16-bit words up to 16 bits, else 32-bit.
+    Unsigned by default, so offset binary codes keep their value; pass
+    signed=True for two's complement dumps sign extended to the word size."""
+    if signed:
+        return np.dtype(np.int16 if num_bits <= 16 else np.int32)
+    return np.dtype(np.uint16 if num_bits <= 16 else np.uint32)
+
+
+def load_capture(path, num_bits, raw_dtype=None):
+    """Returns a capture file as a NumPy array.
+    CSV files are parsed into capture_dtype(num_bits), first column only.
+    .npy files come back whole, and raw binary files (.bin/.dat/.raw, words
+    of raw_dtype, default raw_word_dtype(num_bits)) as a 1-D array; both
+    are read-only memory maps.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.npy':
+        return np.load(path, mmap_mode='r')
+    if suffix in RAW_SUFFIXES:
+        return np.memmap(path, dtype=raw_dtype or raw_word_dtype(num_bits), mode='r')
+    try:
+        return _read_csv(path, capture_dtype(num_bits))[0].to_numpy()
+    except ValueError:
+        # Not integer codes, e.g. a scope export scaled to volts
+        return _read_csv(path, np.float64)[0].to_numpy()
+
+
+def _read_csv(path, dtype, **kwargs):
+    return pd.read_csv(path, header=None, usecols=[0], dtype=dtype, engine='c', **kwargs)
+
+
+def iter_capture_chunks(path, num_bits, chunk_size=1 << 20, raw_dtype=None):
+    """Yields a capture file chunk_size samples at a time."""
+    path = Path(path)
+    if path.suffix.lower() in ('.npy',) + RAW_SUFFIXES:
+        data = load_capture(path, num_bits, raw_dtype)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        return
+    rows = 0
+    try:
+        for frame in _read_csv(path, capture_dtype(num_bits), chunksize=chunk_size):
+            rows += len(frame)
+            yield frame[0].to_numpy()
+    except ValueError:
+        # Non-integer values from here on: carry on as float64
+        for frame in _read_csv(path, np.float64, chunksize=chunk_size, skiprows=rows):
+            yield frame[0].to_numpy()
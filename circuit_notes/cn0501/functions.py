@@ -50,163 +50,179 @@
 """
 import llt.common.exceptions as err
 import math
+import threading
 import time
+import numpy as np
 import llt.utils.sin_params as sp
 
 def make_vprint(verbose):
     if verbose:
         def vprint(string):
-                print string
+                print(string)
     else:
         def vprint(string):
                 pass
     return vprint
 
-def write_to_file_32_bit(filename, data, verbose = False, append = False):
+# Filenames ending in .npy are written as binary capture files (see
+# py_utils/capture_file.py) instead of one line of text per sample, with
+# sample_rate, num_bits and channel_map recorded in the sidecar
+def write_to_file_32_bit(filename, data, verbose = False, append = False,
+                         sample_rate = None, num_bits = None, channel_map = None):
     vprint = make_vprint(verbose)
     vprint('Writing data to file')
-    with open(filename, 'a' if append else 'w') as f:
-        for i in range(len(data)):
-            f.write(str(data[i]) + '\n')
+    if filename.endswith('.npy'):
+        from ROUS.py_utils.capture_file import CaptureWriter
+        with CaptureWriter(filename, 1, sample_rate, num_bits, channel_map,
+                           append = append) as f:
+            f.write(data)
+    else:
+        with open(filename, 'a' if append else 'w') as f:
+            for i in range(len(data)):
+                f.write(str(data[i]) + '\n')
     vprint('File write done.')
 
-def write_channels_to_file_32_bit(filename, *channels, **verbose_kw):
-    vprint = make_vprint(verbose_kw.get("verbose", False))
+# For .npy files the channels are stored side by side in one capture. Takes
+# the keywords of _write_channels (Python 2 has no keyword-only arguments
+# after *channels).
+def write_channels_to_file_32_bit(filename, *channels, **kwargs):
+    _write_channels(filename, channels, **kwargs)
+
+def _write_channels(filename, channels, verbose = False, sample_rate = None,
+                    num_bits = None, channel_map = None):
+    vprint = make_vprint(verbose)
     vprint('Writing data to file')
     if len(channels) < 1:
         vprint('Nothing to write')
         return
+    if filename.endswith('.npy'):
+        from ROUS.py_utils.capture_file import CaptureWriter
+        with CaptureWriter(filename, len(channels), sample_rate, num_bits, channel_map) as f:
+            f.write(*channels)
+        vprint('File write done.')
+        return
     write_to_file_32_bit(filename, channels[0])
     for channel in channels[1:]:
         write_to_file_32_bit(filename, channel, append=True)
     vprint('File write done.')
 
-def plot(num_bits, data, channel = 0, verbose = False):
+def analyze(num_bits, data, channel = 0, verbose = False):
+    """Spectrum and sin_params figures for one channel, without plotting.
+    Returns a dict; the AC figures are None if no AC signal was found."""
     vprint = make_vprint(verbose)
-            
-    from matplotlib import pyplot as plt
-    import numpy as np
-    from matplotlib.font_manager import FontProperties
-    
-    vprint("Plotting channel " + str(channel) + " time domain.") 
-    
-    num_samples = len(data)
-    
-    plt.figure(channel)
-    plt.clf()
-    plt.subplot(2,1,1)
-    fig = plt.gcf()
-    fig.subplots_adjust(right=0.68)
-    plt.plot(data)
-    plt.title('Ch' + str(channel) + ': Time Domain Samples')
     
     vprint("FFT'ing channel " + str(channel) + " data.") 
 
+    data = np.asarray(data)
+    num_samples = len(data)
     adc_amplitude = 2.0**(num_bits-1)
     
     data_no_dc = data - np.average(data) # Remove DC to avoid leakage when windowing
 
-    normalization = 1.968888        
+    # Symmetric 4 term Blackman-Harris window
+    normalization = 1.968888
     a0 = 0.35875
     a1 = 0.48829
     a2 = 0.14128
     a3 = 0.01168
+    t = 2 * math.pi * np.arange(num_samples) / (float(num_samples) - 1.0)
+    wind = normalization * (a0 - a1*np.cos(t) + a2*np.cos(2*t) - a3*np.cos(3*t))
+
+    windowed_data = data_no_dc * wind # Apply Blackman window
+    freq_domain = np.fft.rfft(windowed_data)/(num_samples) # FFT
+    freq_domain_magnitude = np.abs(freq_domain) # Extract magnitude
+    freq_domain_magnitude[1:num_samples//2] *= 2 
+    results = {'freq_domain_magnitude_db': 20 * np.log10(freq_domain_magnitude/adc_amplitude),
+               'max': data.max(),
+               'min': data.min(),
+               'avg': np.mean(data),
+               'harmonics': None, 'snr': None, 'thd': None, 'sinad': None,
+               'enob': None, 'sfdr': None, 'floor': None, 'harmonics_dbfs': None}
     
-    wind = [0 for x in range(num_samples)]
-    for i in range(num_samples):
-        
-        t1 = i / (float(num_samples) - 1.0)
-        t2 = 2 * t1
-        t3 = 3 * t1
-        t1 -= int(t1)
-        t2 -= int(t2)
-        t3 -= int(t3)
-        
-        wind[i] = a0 - \
-                  a1*math.cos(2*math.pi*t1) + \
-                  a2*math.cos(2*math.pi*t2) - \
-                  a3*math.cos(2*math.pi*t3)
+    try:
+        harmonics, snr, thd, sinad, enob, sfdr, floor = sp.sin_params(data)
         
-        wind[i] *= normalization;
-
+        # dBFS of the fundamental and harmonics 2 to 5
+        harmonics_dbfs = [20 * math.log10(math.sqrt(abs(harmonics[h][0]))/2**(num_bits-1))
+                          for h in range(1, 6)]
+    except:
+        return results
+    
+    # The floor is given in dBc. We add the fundimantal to convert to dBFs        
+    results.update(harmonics = harmonics, snr = snr, thd = thd, sinad = sinad, enob = enob,
+                   sfdr = sfdr, floor = floor + harmonics_dbfs[0],
+                   harmonics_dbfs = harmonics_dbfs)
+    return results
 
-    windowed_data = data_no_dc * wind# Apply Blackman window
-    freq_domain = np.fft.fft(windowed_data)/(num_samples) # FFT
-    freq_domain = freq_domain[0:num_samples/2+1]
-    freq_domain_magnitude = np.abs(freq_domain) # Extract magnitude
-    freq_domain_magnitude[1:num_samples/2] *= 2 
-    freq_domain_magnitude_db = 20 * np.log10(freq_domain_magnitude/adc_amplitude)
+def plot(num_bits, data, channel = 0, verbose = False, draw = True):
+    """Analyzes one channel and, if draw is set, plots its time and
+    frequency domain. Returns the analyze() results either way."""
+    results = analyze(num_bits, data, channel, verbose)
+    if not draw:
+        return results
+    
+    vprint = make_vprint(verbose)
+    from matplotlib import pyplot as plt
+    from matplotlib.font_manager import FontProperties
+    
+    vprint("Plotting channel " + str(channel) + " time domain.") 
+    
+    num_samples = len(data)
+    
+    plt.figure(channel)
+    plt.clf()
+    plt.subplot(2,1,1)
+    fig = plt.gcf()
+    fig.subplots_adjust(right=0.68)
+    plt.plot(data)
+    plt.title('Ch' + str(channel) + ': Time Domain Samples')
     
     vprint("Plotting channel " + str(channel) + " frequency domain.")     
     
     ax = plt.subplot(2, 1, 2)
     
     ax.set_title('Ch' + str(channel) + ': FFT')
-    plt.plot(freq_domain_magnitude_db)
+    plt.plot(results['freq_domain_magnitude_db'])
     
-    try:
-        harmonics, snr, thd, sinad, enob, sfdr, floor = sp.sin_params(data)
-        
-        sig_amp = math.sqrt(abs(harmonics[1][0]))
-        fund_dbsf = 20 * math.log10(sig_amp/2**(num_bits-1))
-        f2 = 20 * math.log10((math.sqrt(abs(harmonics[2][0])))/2**(num_bits-1))
-        f3 = 20 * math.log10((math.sqrt(abs(harmonics[3][0])))/2**(num_bits-1))
-        f4 = 20 * math.log10((math.sqrt(abs(harmonics[4][0])))/2**(num_bits-1))
-        f5 = 20 * math.log10((math.sqrt(abs(harmonics[5][0])))/2**(num_bits-1))
-        
-        # The floor is given in dBc. We add the fundimantal to convert to dBFs        
-        floor += fund_dbsf
-        plt.plot([floor for number in xrange(num_samples/2-1)], 'y')
-        
-        max_code = max(data)
-        min_code = min(data)
-        avg = np.mean(data)
-
-        font = FontProperties()
-        font.set_family('monospace')
-        fig.text(0.72,0.40, "F1 BIN:    " + str(harmonics[1][1]) + "\nF1 Amp:   " + "{0:.1f}".format(round(fund_dbsf,1)) + 
-            " dBFS\nF2 Amp:   " + "{0:.1f}".format(round(f2,1)) +
-            " dBFS\nF3 Amp:   " + "{0:.1f}".format(round(f3,1)) +
-            " dBFS\nF4 Amp:   " + "{0:.1f}".format(round(f4,1)) +
-            " dBFS\nF5 Amp:   " + "{0:.1f}".format(round(f5,1)) +
-            " dBFS\n\nSNR:      " + "{0:.1f}".format(round(snr,1)) + " dB\nSINAD:    " + 
-            "{0:.1f}".format(round(sinad,1)) + " dB\nTHD:      " + 
-            "{0:.1f}".format(round(thd,1)) + " dB\nSFDR:     " +
-            "{0:.1f}".format(round(sfdr,1))  + " dB\nENOB:     " + 
-            "{0:.1f}".format(round(enob,1)) + " bits\nMax:      " + str(max_code) +
-            "\nMin:      " + str(min_code) + "\nDC Level: " + 
-            "{0:.1f}".format(round(avg,1)) + "\nFloor:    " +
-            "{0:.1f}".format(round(floor,1)) + " dBFS", fontproperties=font)
-
-        ax.annotate('1',
-            xy=(harmonics[1][1], fund_dbsf), xycoords='data',
-            xytext=(0, -10), textcoords='offset points',
-            horizontalalignment='right', verticalalignment='bottom', color ="green", fontweight='bold')
-        
-        ax.annotate('2',
-            xy=(harmonics[2][1], f2), xycoords='data',
-            xytext=(0, 0), textcoords='offset points',
-            horizontalalignment='right', verticalalignment='bottom', color ="green", fontweight='bold')
-        ax.annotate('3',
-            xy=(harmonics[3][1], f3), xycoords='data',
-            xytext=(0, 0), textcoords='offset points',
-            horizontalalignment='right', verticalalignment='bottom', color ="green", fontweight='bold')
-        ax.annotate('4',
-            xy=(harmonics[4][1], f4), xycoords='data',
-            xytext=(0, 0), textcoords='offset points',
-            horizontalalignment='right', verticalalignment='bottom', color ="green", fontweight='bold')
-        ax.annotate('5',
-            xy=(harmonics[5][1], f5), xycoords='data',
-            xytext=(0, 0), textcoords='offset points',
-            horizontalalignment='right', verticalalignment='bottom', color ="green", fontweight='bold')
-    except:
+    if results['harmonics'] is None:
         fig.text(0.75,0.8, "No AC Signal\nDetected")
+        plt.show()
+        return results
+    
+    harmonics = results['harmonics']
+    fund_dbsf, f2, f3, f4, f5 = results['harmonics_dbfs']
+    floor = results['floor']
+    plt.plot([0, num_samples//2 - 2], [floor, floor], 'y')
+
+    font = FontProperties()
+    font.set_family('monospace')
+    fig.text(0.72,0.40, "F1 BIN:    " + str(harmonics[1][1]) + "\nF1 Amp:   " + "{0:.1f}".format(round(fund_dbsf,1)) + 
+        " dBFS\nF2 Amp:   " + "{0:.1f}".format(round(f2,1)) +
+        " dBFS\nF3 Amp:   " + "{0:.1f}".format(round(f3,1)) +
+        " dBFS\nF4 Amp:   " + "{0:.1f}".format(round(f4,1)) +
+        " dBFS\nF5 Amp:   " + "{0:.1f}".format(round(f5,1)) +
+        " dBFS\n\nSNR:      " + "{0:.1f}".format(round(results['snr'],1)) + " dB\nSINAD:    " + 
+        "{0:.1f}".format(round(results['sinad'],1)) + " dB\nTHD:      " + 
+        "{0:.1f}".format(round(results['thd'],1)) + " dB\nSFDR:     " +
+        "{0:.1f}".format(round(results['sfdr'],1))  + " dB\nENOB:     " + 
+        "{0:.1f}".format(round(results['enob'],1)) + " bits\nMax:      " + str(results['max']) +
+        "\nMin:      " + str(results['min']) + "\nDC Level: " + 
+        "{0:.1f}".format(round(results['avg'],1)) + "\nFloor:    " +
+        "{0:.1f}".format(round(floor,1)) + " dBFS", fontproperties=font)
+
+    for h, (f, offset) in enumerate(zip(results['harmonics_dbfs'], [-10, 0, 0, 0, 0]), 1):
+        ax.annotate(str(h),
+            xy=(harmonics[h][1], f), xycoords='data',
+            xytext=(0, offset), textcoords='offset points',
+            horizontalalignment='right', verticalalignment='bottom', color ="green", fontweight='bold')
     plt.show()
+    return results
 
 def plot_channels(num_bits, *channels, **verbose_kw):
     verbose = verbose_kw.get("verbose", False)
-    for channel_num, channel_data in enumerate(channels):
-        plot(num_bits, channel_data, channel_num, verbose)
+    draw = verbose_kw.get("draw", True)
+    return [plot(num_bits, channel_data, channel_num, verbose, draw)
+            for channel_num, channel_data in enumerate(channels)]
     
 def fix_data(data, num_bits, alignment, is_bipolar, is_randomized = False, is_alternate_bit = False):
     if alignment < num_bits:
@@ -218,7 +234,7 @@ def fix_data(data, num_bits, alignment, is_bipolar, is_randomized = False, is_al
     offset = 1 << num_bits
     mask = offset - 1
     
-    for i in xrange(len(data)):
+    for i in range(len(data)):
         x = data[i]
         x = x >> shift
         if is_randomized and  (x & 1):
@@ -231,37 +247,233 @@ def fix_data(data, num_bits, alignment, is_bipolar, is_randomized = False, is_al
         data[i] = x 
     return data
 
+def fix_data_array(data, num_bits, alignment, is_bipolar, is_randomized = False,
+                   is_alternate_bit = False, in_place = False):
+    """Same conversion as fix_data on a whole array at once. Only the low 32
+    bits of each word are used, as in fix_data. With in_place=True, data
+    must be a uint32 array and is overwritten. Returns an int32 view of the
+    converted words."""
+    if alignment < num_bits:
+        raise err.LogicError("Alignment must be >= num_bits ")
+    if  alignment > 30:
+        raise err.NotSupportedError("Does not support alignment greater than 30 bits")
+    if in_place:
+        if not (isinstance(data, np.ndarray) and data.dtype == np.uint32):
+            raise ValueError("in_place needs a uint32 array")
+        words = data
+    else:
+        words = np.asarray(data).astype(np.int64).astype(np.uint32)
+    
+    words >>= np.uint32(alignment - num_bits)
+    if is_randomized:
+        randomizer = words & np.uint32(1)
+        randomizer *= np.uint32(0x3FFFFFFE)
+        words ^= randomizer
+    if is_alternate_bit:
+        words ^= np.uint32(0x2AAAAAAA)
+    signed = words.view(np.int32)
+    if is_bipolar:
+        # Move the sign bit to bit 31 and shift back arithmetically
+        words <<= np.uint32(32 - num_bits)
+        signed >>= 32 - num_bits
+    else:
+        words &= np.uint32((1 << num_bits) - 1)
+    return signed
+
 def scatter_data(data, num_channels):
     if num_channels == 1:
         return data
-    temp = []
-    for x in range(0,num_channels):
-        temp.append(data[x::num_channels])
-    return tuple(temp)
+    from ROUS.py_utils.deinterleave import deinterleave
+    # Rows of a strided view, no copy when data is already an array
+    return tuple(deinterleave(np.asarray(data), num_channels))
+
+def _read_eeprom_ids(comm, info_list, eeprom_id_size, vprint):
+    # Open every controller on its own thread; a board that can't be
+    # opened (in use elsewhere, say) is left out rather than failing the scan
+    eeprom_ids = [None] * len(info_list)
+    def read(i):
+        try:
+            with comm.Controller(info_list[i]) as controller:
+                eeprom_ids[i] = controller.eeprom_read_string(eeprom_id_size)
+        except Exception as e:
+            vprint('Could not read controller EEPROM: ' + str(e))
+    threads = [threading.Thread(target = read, args = (i,)) for i in range(len(info_list))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [(eeprom_id, info) for eeprom_id, info in zip(eeprom_ids, info_list)
+            if eeprom_id is not None]
+
+class ControllerDiscovery(object):
+    """Session cache of controller EEPROM IDs. The controllers are only
+    rescanned when a dc_number is not found in the cache"""
+    def __init__(self):
+        self._eeprom_ids = {} # (controller_type, eeprom_id_size) -> [(eeprom_id, info)]
+        self._index = {} # (controller_type, eeprom_id_size, dc_number) -> info
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._eeprom_ids.clear()
+            self._index.clear()
+
+    def _search(self, controller_type, dc_number, eeprom_id_size):
+        key = (controller_type, eeprom_id_size, dc_number)
+        if key not in self._index:
+            for eeprom_id, info in self._eeprom_ids.get(key[:2], []):
+                if dc_number in eeprom_id:
+                    self._index[key] = info
+                    break
+        return self._index.get(key)
+
+    def refresh(self, controller_type, eeprom_id_size, vprint = make_vprint(False)):
+        import llt.common.ltc_controller_comm as comm
+        vprint('Looking for a controller board')
+        info_list = comm.list_controllers(controller_type)
+        if info_list is None:
+            raise(err.HardwareError('No controller boards found'))
+        eeprom_ids = _read_eeprom_ids(comm, info_list, eeprom_id_size, vprint)
+        with self._lock:
+            self._eeprom_ids[(controller_type, eeprom_id_size)] = eeprom_ids
+            for key in [k for k in self._index if k[:2] == (controller_type, eeprom_id_size)]:
+                del self._index[key]
+
+    def find(self, controller_type, dc_number, eeprom_id_size, vprint = make_vprint(False)):
+        with self._lock:
+            info = self._search(controller_type, dc_number, eeprom_id_size)
+        if info is None:
+            self.refresh(controller_type, eeprom_id_size, vprint)
+            with self._lock:
+                info = self._search(controller_type, dc_number, eeprom_id_size)
+        if info is None:
+            raise(err.HardwareError('Could not find a compatible device'))
+        vprint('Found the ' + dc_number + ' demoboard')
+        return info
+
+    def evict(self, controller_type, dc_number, eeprom_id_size):
+        """Forgets the controller cached for dc_number, e.g. after it was
+        unplugged or moved to another port"""
+        with self._lock:
+            info = self._index.pop((controller_type, eeprom_id_size, dc_number), None)
+            key = (controller_type, eeprom_id_size)
+            if info is not None and key in self._eeprom_ids:
+                self._eeprom_ids[key] = [(eeprom_id, i) for eeprom_id, i in self._eeprom_ids[key]
+                                         if i is not info]
+
+    def open(self, controller_type, dc_number, eeprom_id_size, vprint = make_vprint(False)):
+        """Opens the controller for dc_number. If the cached entry can't be
+        opened it is evicted, the controllers are rescanned once and the
+        open is retried"""
+        import llt.common.ltc_controller_comm as comm
+        info = self.find(controller_type, dc_number, eeprom_id_size, vprint)
+        try:
+            return comm.Controller(info)
+        except Exception as e:
+            vprint('Could not open the ' + dc_number + ' demoboard, rescanning: ' + str(e))
+            self.evict(controller_type, dc_number, eeprom_id_size)
+        self.refresh(controller_type, eeprom_id_size, vprint)
+        with self._lock:
+            info = self._search(controller_type, dc_number, eeprom_id_size)
+        if info is None:
+            raise(err.HardwareError('Could not find a compatible device'))
+        return comm.Controller(info)
+
+controller_discovery = ControllerDiscovery()
 
 def get_controller_info_by_eeprom(controller_type, dc_number, eeprom_id_size, vprint):
-    import llt.common.ltc_controller_comm as comm
-    # find demo board with correct ID
-    vprint('Looking for a controller board')
-    info_list = comm.list_controllers(controller_type)
-    if info_list is None:
-        raise(err.HardwareError('No controller boards found'))
-    for info in comm.list_controllers(controller_type):
-        with comm.Controller(info) as controller:
-            eeprom_id = controller.eeprom_read_string(eeprom_id_size)
-            if dc_number in eeprom_id:
-                vprint('Found the ' + dc_number + ' demoboard')
-                return info
-    raise(err.HardwareError('Could not find a compatible device'))
+    return controller_discovery.find(controller_type, dc_number, eeprom_id_size, vprint)
+
+# Use as "with open_controller_by_eeprom(...) as controller:"
+def open_controller_by_eeprom(controller_type, dc_number, eeprom_id_size, vprint):
+    return controller_discovery.open(controller_type, dc_number, eeprom_id_size, vprint)
+
+# Collect polling backs off exponentially from COLLECT_POLL_MIN to
+# COLLECT_POLL_MAX seconds, so short captures are seen almost at once
+# without flooding the controller with status reads on long ones
+COLLECT_POLL_MIN = 100e-6
+COLLECT_POLL_MAX = 0.02
+_clock = getattr(time, 'perf_counter', time.time)
+
+class CollectStats(object):
+    """Time-to-ready, in seconds, of every collect that finished"""
+    def __init__(self):
+        self.times = []
+    def record(self, seconds):
+        self.times.append(seconds)
+    def reset(self):
+        del self.times[:]
+    def summary(self):
+        if not self.times:
+            return {'count': 0, 'min': None, 'mean': None, 'max': None}
+        return {'count': len(self.times), 'min': min(self.times),
+                'mean': sum(self.times) / len(self.times), 'max': max(self.times)}
+
+collect_stats = CollectStats()
+
+class PendingCollect(object):
+    """A started collect, polled by wait_collects. Once done, time_to_ready
+    holds the seconds it took, or timed_out is set"""
+    def __init__(self, controller_board, timeout, callback = None):
+        self.controller_board = controller_board
+        self.callback = callback
+        self.time_to_ready = None
+        self.timed_out = False
+        self._start = _clock()
+        self._deadline = self._start + timeout
+        self._delay = COLLECT_POLL_MIN
+        self.next_poll = self._start
+
+    def done(self):
+        return self.timed_out or self.time_to_ready is not None
+
+    def result(self):
+        """Seconds until the collect was ready; raises if it timed out"""
+        if self.timed_out:
+            raise err.HardwareError('Data collect timed out (missing clock?)')
+        return self.time_to_ready
+
+    def poll(self):
+        """Checks the controller once. Returns True when the collect is done"""
+        now = _clock()
+        if self.controller_board.controller.data_is_collect_done():
+            self.time_to_ready = now - self._start
+            collect_stats.record(self.time_to_ready)
+        elif now >= self._deadline:
+            self.timed_out = True
+        else:
+            self.next_poll = min(now + self._delay, self._deadline)
+            self._delay = min(self._delay * 2, COLLECT_POLL_MAX)
+            return False
+        if self.callback is not None:
+            self.callback(self)
+        return True
+
+def begin_collect(controller_board, num_samples, trigger, timeout = 5, callback = None):
+    """Starts a collect without waiting for it. Pass the returned
+    PendingCollect (or several, one per controller) to wait_collects"""
+    controller_board.controller.data_start_collect(num_samples, trigger)
+    return PendingCollect(controller_board, timeout, callback)
+
+def wait_collects(pending):
+    """Polls every PendingCollect from this thread, each on its own backoff,
+    until all are done. Callbacks run as each one finishes. Raises
+    HardwareError afterwards if any of them timed out"""
+    pending = list(pending)
+    waiting = list(pending)
+    while waiting:
+        next_poll = min(p.next_poll for p in waiting)
+        delay = next_poll - _clock()
+        if delay > 0:
+            time.sleep(delay)
+        now = _clock()
+        waiting = [p for p in waiting if p.next_poll > now or not p.poll()]
+    for p in pending:
+        p.result()
+    return [p.time_to_ready for p in pending]
 
 def start_collect(controller_board, num_samples, trigger, timeout = 5):
-        controller_board.controller.data_start_collect(num_samples, trigger)
-        SLEEP_TIME = 0.2 
-        for i in range(int(math.ceil(timeout/SLEEP_TIME))):
-            if controller_board.controller.data_is_collect_done():
-                return
-            time.sleep(SLEEP_TIME)
-        raise err.HardwareError('Data collect timed out (missing clock?)')
+    return wait_collects([begin_collect(controller_board, num_samples, trigger, timeout)])[0]
 
 def uint32_to_int32(data): 
     return [(int(d - 4294967296 if d > 2147483647 else d)) for d in data] 
\ No newline at end of file
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2016-2019 Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+
+"""
+Tests that fix_data_array gives bit-identical results to the per-sample
+fix_data for every bit width, alignment and data format, on random 32-bit
+words plus the words at the edges of each format; and that
+ControllerDiscovery recovers from a cached controller that went away.
+
+Needs the linear_lab_tools (llt) package, like functions.py. Run from this
+directory with:
+    python -m pytest test_functions.py
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip('llt')
+
+import functions
+
+NUM_WORDS = 4096
+EDGE_WORDS = [0x00000000, 0x00000001, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFE, 0xFFFFFFFF,
+              0x2AAAAAAA, 0x55555555, 0x3FFFFFFE, 0x3FFFFFFF]
+
+def random_words(num_bits, alignment):
+    rng = np.random.default_rng(num_bits * 100 + alignment)
+    words = [int(w) for w in rng.integers(0, 1 << 32, NUM_WORDS, dtype = np.uint64)]
+    # Every value around zero, full scale and the sign bit, at the alignment
+    shift = alignment - num_bits
+    for code in (0, 1, (1 << (num_bits - 1)) - 1, 1 << (num_bits - 1),
+                 (1 << num_bits) - 2, (1 << num_bits) - 1):
+        words += [code << shift, (code << shift) | ((1 << shift) - 1)]
+    return words + EDGE_WORDS
+
+FORMATS = [pytest.param(is_bipolar, is_randomized, is_alternate_bit,
+                        id = '-'.join([('twos' if is_bipolar else 'offset'),
+                                       ('rand' if is_randomized else 'plain'),
+                                       ('alt' if is_alternate_bit else 'noalt')]))
+           for is_bipolar in (True, False)
+           for is_randomized in (False, True)
+           for is_alternate_bit in (False, True)]
+
+@pytest.mark.parametrize('num_bits, alignment', [
+    (8, 8), (12, 16), (14, 14), (16, 16), (16, 20), (18, 18), (18, 24),
+    (20, 24), (24, 24), (24, 30), (30, 30)])
+@pytest.mark.parametrize('is_bipolar, is_randomized, is_alternate_bit', FORMATS)
+def test_fix_data_array_matches_fix_data(num_bits, alignment, is_bipolar, is_randomized,
+                                         is_alternate_bit):
+    words = random_words(num_bits, alignment)
+    expected = np.array(functions.fix_data(list(words), num_bits, alignment, is_bipolar,
+                                           is_randomized, is_alternate_bit), dtype = np.int64)
+    
+    for data in (words, np.array(words, dtype = np.uint32), np.array(words, dtype = np.int64)):
+        result = functions.fix_data_array(data, num_bits, alignment, is_bipolar,
+                                          is_randomized, is_alternate_bit)
+        assert result.dtype == np.int32
+        np.testing.assert_array_equal(result, expected)
+    
+    in_place = np.array(words, dtype = np.uint32)
+    result = functions.fix_data_array(in_place, num_bits, alignment, is_bipolar,
+                                      is_randomized, is_alternate_bit, in_place = True)
+    assert np.shares_memory(result, in_place)
+    np.testing.assert_array_equal(result, expected)
+
+def test_fix_data_array_rejects_what_fix_data_rejects():
+    with pytest.raises(Exception) as expected:
+        functions.fix_data([0], 18, 16, True)
+    with pytest.raises(type(expected.value)):
+        functions.fix_data_array([0], 18, 16, True)
+    with pytest.raises(Exception) as expected:
+        functions.fix_data([0], 18, 31, True)
+    with pytest.raises(type(expected.value)):
+        functions.fix_data_array([0], 18, 31, True)
+    with pytest.raises(ValueError):
+        functions.fix_data_array(np.zeros(4, dtype = np.int32), 18, 18, True, in_place = True)
+
+class FakeComm(object):
+    """Stands in for llt.common.ltc_controller_comm: boards maps a
+    controller description to its EEPROM ID"""
+    def __init__(self, boards):
+        self.boards = boards
+        self.scans = 0
+        self.opened = []
+    def list_controllers(self, controller_type):
+        self.scans += 1
+        return [types.SimpleNamespace(description = d) for d in sorted(self.boards)] or None
+    def Controller(self, info):
+        if info.description not in self.boards:
+            raise IOError(info.description + ' is gone')
+        comm = self
+        class Controller(object):
+            def __enter__(self):
+                return self
+            def __exit__(self, a, b, c):
+                pass
+            def eeprom_read_string(self, size):
+                return comm.boards[info.description][:size]
+        comm.opened.append(info.description)
+        return Controller()
+
+@pytest.fixture
+def fake_comm(monkeypatch):
+    comm = FakeComm({'A': 'DC2222A', 'B': 'DC1925A'})
+    import llt.common
+    monkeypatch.setitem(sys.modules, 'llt.common.ltc_controller_comm', comm)
+    monkeypatch.setattr(llt.common, 'ltc_controller_comm', comm, raising = False)
+    return comm
+
+def test_discovery_caches_controllers(fake_comm):
+    discovery = functions.ControllerDiscovery()
+    assert discovery.find('dc718', 'DC2222', 50).description == 'A'
+    assert discovery.find('dc718', 'DC1925', 50).description == 'B'
+    assert discovery.find('dc718', 'DC2222', 50).description == 'A'
+    assert fake_comm.scans == 1
+
+def test_discovery_open_rescans_when_controller_moved(fake_comm):
+    discovery = functions.ControllerDiscovery()
+    with discovery.open('dc718', 'DC2222', 50):
+        pass
+    assert fake_comm.scans == 1
+    # The board comes back under a new description
+    fake_comm.boards['C'] = fake_comm.boards.pop('A')
+    with discovery.open('dc718', 'DC2222', 50):
+        pass
+    assert fake_comm.scans == 2
+    assert discovery.find('dc718', 'DC2222', 50).description == 'C'
+    assert discovery.find('dc718', 'DC1925', 50).description == 'B'
+
+def test_discovery_open_gives_up_after_one_rescan(fake_comm):
+    discovery = functions.ControllerDiscovery()
+    discovery.find('dc718', 'DC2222', 50)
+    del fake_comm.boards['A']
+    with pytest.raises(functions.err.HardwareError):
+        discovery.open('dc718', 'DC2222', 50)
+    assert fake_comm.scans == 2
+    # The stale entry is gone, so the next lookup scans again
+    with pytest.raises(functions.err.HardwareError):
+        discovery.find('dc718', 'DC2222', 50)
+    assert fake_comm.scans == 3
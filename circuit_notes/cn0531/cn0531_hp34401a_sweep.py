@@ -57,11 +57,12 @@ print("setting up DAC, setting output to 0.0V...")
 dac_scale = mydac.channel[0].scale # This is set by the device tree, it's not an actual measured value.
 mydac.channel[0].powerdown=0 # Power up (Default state is powered down.)
 print("DAC scale factor: " + str(dac_scale))
+hp34401a_config_voltage(hp34401a) # Auto range/resolution, set up once for the whole sweep
 for i in range(0,6):
     print("setting DAC to %f volts" % (i * 0.4999))
     mydac.channel[0].volts = (i * 0.4999)
     sleep(0.1)
-    readback = hp34401a_read_voltage(hp34401a)
+    readback = hp34401a_read_voltages(hp34401a)[0]
     print("meter: %f" % (readback))
     sleep(1.0)
 
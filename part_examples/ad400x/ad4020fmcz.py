@@ -16,6 +16,7 @@ import time, struct
 import numpy as np
 import matplotlib.pyplot as plt
 import llt.common.functions as funcs
+from ROUS.py_utils.deinterleave import deinterleave
 
 bufflen = 2**13
 
@@ -43,11 +44,8 @@ for j in range(5): #Flush buffers.
 del rxbuf
 del ctx
           
-#get data from buffer
-data = np.frombuffer(x, np.int32)
-for i in range(0, len(data)):
-  if(data[i] > 2**19):
-    data[i] -= 2**20
+#get data from buffer (20-bit data, right justified in a 32-bit word)
+data = deinterleave(x, 1, num_bits=20)[0]
 
 do_plot = True
 do_write_to_file = False
@@ -1,7 +1,7 @@
 '''
 AD7768-FMCZ Zedboard data capture, plot, save module
 
-Provides a single functon that returns a list of lists of individual channel data
+Provides a single functon that returns an array with a row of data per channel
 Optionally analyzes and plots all channels and / or save data to a file
 
 testdata = eval_ad7768_fmcz(my_ip, NUM_SAMPLES, verbose=True, do_plot = True,
@@ -15,6 +15,7 @@ def eval_ad7768_fmcz(my_ip, NUM_SAMPLES, verbose=True, do_plot = True,
                              do_write_to_file = True):
     import sys
     import numpy as np
+    from ROUS.py_utils.deinterleave import deinterleave
 
     try:
         import iio
@@ -61,11 +62,8 @@ def eval_ad7768_fmcz(my_ip, NUM_SAMPLES, verbose=True, do_plot = True,
     del ctx
 
     #get data from buffer (signed 24-bit data, right justified in a 32-bit word)
-    data = np.frombuffer(x, np.int32)
-
-    #split data into respective channels
-    ch_data = [data[0::8],data[1::8],data[2::8],data[3::8],
-               data[4::8],data[5::8],data[6::8],data[7::8]]
+    #and split it into respective channels, one row per channel
+    ch_data = deinterleave(x, 8, num_bits=24)
     if do_plot == True:
         import llt.common.functions as llt_fns
         llt_fns.plot_channels(24,
@@ -46,6 +46,9 @@
         Avalon MM bus.
 """
 
+import binascii
+import re
+
 # Global constants
 CONST_SEQUENTIAL_WRITE = 0x04
 CONST_SEQUENTIAL_READ = 0x14
@@ -63,106 +66,89 @@ CONST_ESC = 0x7D
 CONST_BYTES_IDLE_CHAR = 0x4A
 CONST_BYTES_ESC_CHAR = 0x4D
 
+# Each byte that needs stuffing and the escape byte in front of it, in the
+# order the replacements have to run: the packet layer escapes 0x7A-0x7D
+# with 0x7D, then the bytes layer escapes 0x4A/0x4D with 0x4D. Neither
+# layer produces bytes the other one escapes, so one replace per byte
+# covers both.
+_ESCAPES = [(CONST_ESC, CONST_ESC), (CONST_SOP, CONST_ESC), (CONST_EOP, CONST_ESC),
+            (CONST_CHANNEL, CONST_ESC), (CONST_BYTES_ESC_CHAR, CONST_BYTES_ESC_CHAR),
+            (CONST_BYTES_IDLE_CHAR, CONST_BYTES_ESC_CHAR)]
+_STUFFING = [(bytes(bytearray([char])), bytes(bytearray([esc, char ^ 0x20])))
+             for char, esc in _ESCAPES]
+# translate() deletion table that leaves only the bytes that need stuffing
+_NOT_STUFFED = bytes(bytearray(x for x in range(256) if x not in dict(_ESCAPES)))
+
+def _stuff(raw):
+    # Most payloads contain none or only a few of the six escaped bytes, so
+    # find which ones are present in one pass and only replace those.
+    present = raw.translate(None, _NOT_STUFFED)
+    for char, escaped in _STUFFING:
+        if char in present:
+            raw = raw.replace(char, escaped)
+    return raw
+
+# Creates the stuffed packet for a read or write as bytes. data can be
+# bytes, bytearray, memoryview or anything bytearray() accepts.
+def encode_packet(trans_type, size, address, data = None):
+    body = bytearray([trans_type, 0, (size>>8) & 0xFF, size & 0xFF, (address>>24) & 0xFF,
+                      (address>>16) & 0xFF, (address>>8) & 0xFF, address & 0xFF])
+    if data is not None:
+        payload = bytearray(data[:size])
+        if len(payload) < size:
+            raise ValueError("data has {0:d} bytes, size is {1:d}".format(len(payload), size))
+        body += payload
+    return encode_frame(body)
+
+# Stuffs and frames raw bytes as a packet on channel 0. Responses from the
+# bridge use the same framing.
+def encode_frame(body):
+    body = bytes(bytearray(body))
+    
+    # EOP goes in front of the last (possibly escaped) byte
+    return (bytes(bytearray([CONST_SOP, CONST_CHANNEL, 0])) + _stuff(body[:-1]) +
+            bytes(bytearray([CONST_EOP])) + _stuff(body[-1:]))
+
 # Creates the packet for a read and write
 def create_packet(trans_type, size, address, data = None):
-    # Setup header from address
-    header = [trans_type, 0, (size>>8)& 0xFF, size & 0xFF,(address>>24) & 0xFF,
-            (address>>16) & 0xFF, (address>>8) & 0xFF, address & 0xFF]
-    
-    temp_header = []
-    
-    for x in range(0, 8):
-        if int(header[x]) == CONST_CHANNEL:
-            temp_header.append(CONST_ESC)
-            temp_header.append(int(CONST_CHANNEL) ^ 0x20)
-        elif int(header[x]) == CONST_ESC:
-            temp_header.append(CONST_ESC)
-            temp_header.append(int(CONST_ESC) ^ 0x20)
-        elif int(header[x]) == CONST_SOP:
-            temp_header.append(CONST_ESC)
-            temp_header.append(int(CONST_SOP) ^ 0x20)
-        elif int(header[x]) == CONST_EOP:
-            temp_header.append(CONST_ESC)
-            temp_header.append(int(CONST_EOP) ^ 0x20)
-        else:
-            temp_header.append(header[x])
-    
-    header = temp_header
-    if data is None:
-        pass # Do nothing
-    else:
-        # Add the data to the header
-        for x in range(0, size):
-            # Insert ESC bytes to all cases and XOR data 
-            if(int(data[x]) == CONST_ESC):
-                header.append(CONST_ESC)
-                header.append(int(data[x]) ^ 0x20)
-            elif(int(data[x]) == CONST_SOP):
-                header.append(CONST_ESC)
-                header.append(int(data[x]) ^ 0x20)
-            elif(int(data[x]) == CONST_EOP):
-                header.append(CONST_ESC)
-                header.append(int(data[x]) ^ 0x20)
-            elif(int(data[x]) == CONST_CHANNEL):
-                header.append(CONST_ESC)
-                header.append(int(data[x]) ^ 0x20)
-            else:   
-                header.append(int(data[x]) & 0xFF)
-
-    # Build the packet
-    packet = [CONST_SOP, CONST_CHANNEL, 0 ]
-    
-    # Add the header
-    packet += header 
-    
-    # Insert the EOP byte
-    if packet[len(packet)-2] == CONST_ESC:
-        packet.insert(len(packet)-2, CONST_EOP)
-    else:
-        packet.insert(len(packet)-1, CONST_EOP)
-
-    x = 0
-    # Insert ESC characters to all cases and XOR data
-    while len(packet) > x:
-        if (packet[x] == CONST_BYTES_ESC_CHAR):
-            temp = packet[x]
-            packet[x] = CONST_BYTES_ESC_CHAR
-            packet.insert(x+1, temp ^ 0x20)
-        if (packet[x] == CONST_BYTES_IDLE_CHAR):
-            temp = packet[x]
-            packet[x] = CONST_BYTES_ESC_CHAR
-            packet.insert(x+1, temp ^ 0x20)
-        x += 1
-    return packet
+    if data is not None:
+        data = bytearray(int(data[x]) & 0xFF for x in range(0, size))
+    return list(bytearray(encode_packet(trans_type, size, address, data)))
+
+_HEX_STRING = re.compile(r'[0-9A-Fa-f]*\Z')
+
+# Converts a packet to the DC590 command string: CS low, an "S" and two hex
+# digits per byte, an "R" per nibble to read back, then CS high
+def encode_DC590(packet, read_bytes):
+    hex_digits = binascii.hexlify(bytes(bytearray(packet))).upper()
+    spi = bytearray(b'S' * (len(hex_digits) // 2 * 3))
+    spi[1::3] = hex_digits[0::2]
+    spi[2::3] = hex_digits[1::2]
+    read = 'R' * (2*read_bytes + 4) if read_bytes > 0 else ''
+    return 'x' + spi.decode('ascii') + read + 'X'
+
+# Converts a DC590 hex response to a bytearray. An odd trailing nibble
+# becomes a byte of its own.
+def decode_DC590(string):
+    if isinstance(string, (bytes, bytearray)):
+        string = string.decode('ascii')
+    if len(string) % 2:
+        return bytearray.fromhex(string[:-1]) + bytearray([int(string[-1], 16)])
+    return bytearray.fromhex(string)
 
 # Converts the packets to DC590 string
 def packet_to_DC590(packet, read_bytes):
-    # Create 590 String
-    dc590_string = ""
-    
-    # Insert SPI characters for the DC590
-    for x in range(0,len(packet)):
-        dc590_string += "S" + hex(packet[x])
-        if packet[x] < 0x10:
-            dc590_string = dc590_string.replace('x', '')
-        else:
-            dc590_string = dc590_string.replace('0x', '')
-    # Insert read charters 
-    if read_bytes > 0:
-        for x in range(0,2*read_bytes + 4):
-            dc590_string += 'R'
-        
-    # Insert CS Low and High characters. Also, ensure all HEX characters are capitalized
-    dc590_string = 'x'+ dc590_string.upper() + 'X'
-    
-    return dc590_string # Return the string
+    return encode_DC590(packet, read_bytes)
 
 # Converts DC590 string to list packets
 def DC590_to_packet(string):
-    # Create a list
+    if isinstance(string, (bytes, bytearray)):
+        string = string.decode('ascii')
+    if _HEX_STRING.match(string):
+        return list(decode_DC590(string))
+
+    # Anything that isn't plain hex goes through the original nibble parser
     packet = [];
-    
-    # Convert the string to list 
     for x in range(0, len(string), 2):
         try:
             packet.append((int(string[x],16)<<4) + (int(string[x+1],16)))
@@ -170,36 +156,35 @@ def DC590_to_packet(string):
             packet.append((int(string[x],16)))
     return packet
 
+# Bytes layer: IDLE bytes are dropped and ESC_CHAR escapes the byte after it
+_BYTES_LAYER = re.compile(br'\x4a|\x4d[\x00-\xff]?')
+# Packet layer: SOP/EOP are dropped, CHANNEL is dropped along with the channel
+# number after it and ESC escapes the byte after it
+_PACKET_LAYER = re.compile(br'[\x7a\x7b]|\x7c[\x00-\xff]?|\x7d[\x00-\xff]?')
+
+def _unstuff(match):
+    chars = bytearray(match.group())
+    if chars[0] in (CONST_BYTES_IDLE_CHAR, CONST_SOP, CONST_EOP):
+        return b''
+    if len(chars) == 1:
+        raise ValueError("packet ends in the middle of an escape or channel")
+    if chars[0] == CONST_CHANNEL:
+        return b''
+    return bytes(bytearray([chars[1] ^ 0x20]))
+
+# Decodes a stuffed response back to its payload. Each layer is one
+# left-to-right scan that only calls back into Python at special bytes,
+# so decoding is linear in the packet length.
+def decode_packet(packet):
+    raw = bytes(bytearray(packet))
+    return bytearray(_PACKET_LAYER.sub(_unstuff, _BYTES_LAYER.sub(_unstuff, raw)))
+
 # Converts the packet to data list     
 def packet_to_data(packet):
-    
-    x = 0
-    # Remove the IDLE and ESC characters to all cases and XOR data
-    while len(packet) > x:
-        if (packet[x] == CONST_BYTES_IDLE_CHAR):
-            packet.pop(x)
-            x -= 1
-        elif (packet[x] == CONST_BYTES_ESC_CHAR):
-            packet.pop(x)
-            packet[x] = packet[x] ^ 0x20
-        x += 1
-    # Remove the SOP, EOP, Channel, and ESC bytes to all cases and XOR data 
-    x = 0 
-    while len(packet) > x:
-        if (packet[x] == CONST_CHANNEL):
-            packet.pop(x)
-            packet.pop(x)
-            x -= 1
-        elif (packet[x] == CONST_SOP) or (packet[x] == CONST_EOP):
-            packet.pop(x)
-            x -= 1
-        elif (packet[x] == CONST_ESC):
-            packet.pop(x)
-            packet[x] = packet[x] ^ 0x20 
-        x += 1
-    if len(packet) == 0:
+    data = decode_packet(packet)
+    if len(data) == 0:
         return [0, 0, 0, 0, 0, 0, 0, 0]
-    return packet
+    return list(data)
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
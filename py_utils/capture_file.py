@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2015-2019 Analog Devices, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+#
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+"""Binary capture files that can be appended to while recording.
+
+Samples go to a standard .npy file, shape (num_samples, num_channels), so
+each chunk lands at the end of the file. A JSON sidecar next to it
+(capture.npy -> capture.json) records the sample rate, bit depth and
+channel map, and is written once. Each chunk adds one line to a JSON lines
+log (capture.chunks.jsonl) with its start and a timestamp. Only the
+fixed-size .npy header is rewritten after every chunk, so the cost of a
+chunk doesn't grow with the length of the recording, and a recording that
+is cut short is still readable up to the last complete chunk.
+
+    with CaptureWriter('capture.npy', 8, sample_rate=256000, num_bits=24) as f:
+        for chunk in chunks:            # (8, n) arrays, one row per channel
+            f.write(*chunk)
+
+    data, info = open_capture('capture.npy')    # (8, num_samples) memory map
+"""
+
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# Bytes reserved for the .npy preamble, enough for 20 digit sample counts
+# so the header can be rewritten in place as the file grows
+NPY_HEADER_SIZE = 128
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+def chunk_log_path(path):
+    return os.path.splitext(path)[0] + '.chunks.jsonl'
+
+def _read_chunk_log(path):
+    # A line cut short by a crash is ignored
+    chunks = []
+    if os.path.exists(chunk_log_path(path)):
+        with open(chunk_log_path(path)) as f:
+            for line in f:
+                if line.endswith('\n'):
+                    chunks.append(json.loads(line))
+    return chunks
+
+def _npy_num_samples(path):
+    with open(path, 'rb') as f:
+        np.lib.format.read_magic(f)
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+    return shape[0]
+
+def _npy_header(dtype, num_samples, num_channels):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d, %d), }" % (
+        str(np.dtype(dtype).str), num_samples, num_channels)
+    header = header.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+class CaptureWriter:
+    """Writes a capture file a chunk at a time.
+       path: the .npy file; the sidecar goes next to it
+       num_channels: channels per sample frame
+       sample_rate, num_bits: recorded in the sidecar
+       channel_map: a name per channel, defaults to ch0, ch1, ...
+       dtype: sample type on disk
+       metadata: extra JSON-serializable items for the sidecar
+       append: continue an existing capture instead of starting over
+    """
+
+    def __init__(self, path, num_channels, sample_rate = None, num_bits = None,
+                 channel_map = None, dtype = np.int32, metadata = None, append = False):
+        self.path = path
+        if append and os.path.exists(path):
+            with open(sidecar_path(path)) as f:
+                self.info = json.load(f)
+            if self.info['num_channels'] != num_channels:
+                raise ValueError("{0} has {1:d} channels, not {2:d}".format(
+                    path, self.info['num_channels'], num_channels))
+            self.dtype = np.dtype(str(self.info['dtype']))
+            self._open_for_append()
+            return
+
+        if channel_map is None:
+            channel_map = ['ch' + str(i) for i in range(num_channels)]
+        if len(channel_map) != num_channels:
+            raise ValueError("channel_map needs a name for each of the {0:d} channels".format(
+                num_channels))
+        self.dtype = np.dtype(dtype)
+        self.info = {'format_version': FORMAT_VERSION,
+                     'dtype': self.dtype.str,
+                     'num_channels': num_channels,
+                     'channel_map': list(channel_map),
+                     'sample_rate': sample_rate,
+                     'num_bits': num_bits,
+                     'start_time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+        self.info.update(metadata or {})
+        self._num_samples = 0
+        self._file = open(path, 'w+b')
+        self._write_header()
+        self._write_sidecar()
+        self._log = open(chunk_log_path(path), 'w')
+
+    def _open_for_append(self):
+        # The .npy header is the record of what is complete: drop samples
+        # and log lines past it
+        chunks = _read_chunk_log(self.path)
+        self._num_samples = _npy_num_samples(self.path)
+        self._file = open(self.path, 'r+b')
+        self._file.truncate(NPY_HEADER_SIZE +
+                            self._num_samples * self.info['num_channels'] * self.dtype.itemsize)
+        # Rewritten rather than appended to, which also drops a last line
+        # that was cut short
+        self._log = open(chunk_log_path(self.path), 'w')
+        self._log.writelines(json.dumps(c) + '\n' for c in chunks
+                             if c['start'] + c['num_samples'] <= self._num_samples)
+        self._log.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, a, b, c):
+        self.close()
+
+    @property
+    def num_samples(self):
+        return self._num_samples
+
+    def write(self, *channels):
+        """Appends one equal-length array per channel"""
+        if len(channels) != self.info['num_channels']:
+            raise ValueError("expected {0:d} channels, got {1:d}".format(
+                self.info['num_channels'], len(channels)))
+        self.write_frames(np.stack([np.asarray(ch) for ch in channels], axis=-1))
+
+    def write_frames(self, frames):
+        """Appends a (num_samples, num_channels) array, e.g. an interleaved
+           capture buffer reshaped without copying"""
+        frames = np.asarray(frames, dtype=self.dtype).reshape(-1, self.info['num_channels'])
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(np.ascontiguousarray(frames).tobytes())
+        chunk = {'start': self._num_samples, 'num_samples': len(frames), 'time': time.time()}
+        self._num_samples += len(frames)
+        # Data, then the header that covers it, then the log line
+        self._file.flush()
+        self._write_header()
+        self._log.write(json.dumps(chunk) + '\n')
+        self._log.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            self._log.close()
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, self._num_samples, self.info['num_channels']))
+        self._file.flush()
+
+    def _write_sidecar(self):
+        with open(sidecar_path(self.path), 'w') as f:
+            json.dump(self.info, f, indent=1)
+
+def open_capture(path, mode = 'r'):
+    """Opens a capture file as a memory map
+       returns (data, info): data is a (num_channels, num_samples) view of
+       the file, info the sidecar contents plus num_samples and the list of
+       chunks from the log
+       mode: 'r' read only, 'r+' to modify samples in place, 'c' copy on write
+    """
+    with open(sidecar_path(path)) as f:
+        info = json.load(f)
+    data = np.load(path, mmap_mode=mode)
+    info['num_samples'] = data.shape[0]
+    info['chunks'] = [c for c in _read_chunk_log(path)
+                      if c['start'] + c['num_samples'] <= info['num_samples']]
+    return data.T, info
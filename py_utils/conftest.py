@@ -0,0 +1,9 @@
+# The py_utils modules import each other as top-level modules (they are
+# run from this directory), so put it on sys.path for the tests as well.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Hardware script whose name matches pytest's *_test.py pattern
+collect_ignore = ['m2k_noise_loopback_test.py']
@@ -48,18 +48,100 @@
 ###############################################################################
 # Libraries
 ###############################################################################
+import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import serial
 from serial.tools.list_ports import comports
 
+# Last port a Linduino was found on, keyed by the USB serial number
+CACHE_FILE = os.path.join(os.path.expanduser('~'), '.linduino_port.json')
+RESET_TIME = 2      # A delay is needed for the Linduino to reset
+
 def get_available_ports():
     return [str(c[0]) for c in comports()]
 
+def _serial_number(port):
+    for c in comports():
+        if str(c[0]) == port:
+            return getattr(c, 'serial_number', None)
+    return None
+
+def _is_dc590(ser):
+    ser.write(b"i")
+    id_linduino = ser.read(50)
+    return id_linduino[20:25] == b"DC590"
+
+# Returns an open serial port if a DC590 answers on it, otherwise None.
+# DTR is held low so the board isn't reset by opening the port, where the
+# driver allows it. Ask for the ID straight away and only wait for a reset
+# if that gets no answer.
+def probe_port(port):
+    try:
+        ser = serial.Serial()
+        ser.port = port
+        ser.baudrate = 115200
+        ser.timeout = 0.1
+        ser.dtr = False
+        ser.open()
+    except Exception:
+        return None
+    try:
+        if _is_dc590(ser):
+            return ser
+        time.sleep(RESET_TIME)
+        ser.timeout = 0.5
+        ser.read(50)        # Remove the hello from buffer
+        if _is_dc590(ser):
+            return ser
+    except Exception:
+        pass
+    ser.close()
+    return None
+
+# Probes all ports at once, so the reset delays overlap. Returns the port
+# name and the open serial port of the first Linduino found.
+def find_linduino(ports):
+    if not ports:
+        return None, None
+    with ThreadPoolExecutor(max_workers = len(ports)) as pool:
+        found = list(pool.map(probe_port, ports))
+    linduino = (None, None)
+    for port, ser in zip(ports, found):
+        if ser is None:
+            continue
+        if linduino[1] is None:
+            linduino = (port, ser)
+        else:
+            ser.close()
+    return linduino
+
+def _load_cached_port():
+    try:
+        with open(CACHE_FILE) as f:
+            cached = json.load(f)
+    except (IOError, ValueError):
+        return None
+    # The serial number follows the board when it moves to another port
+    for c in comports():
+        if cached.get('serial_number') and getattr(c, 'serial_number', None) == cached['serial_number']:
+            return str(c[0])
+    return cached.get('port')
+
+def _save_cached_port(port):
+    try:
+        with open(CACHE_FILE, 'w') as f:
+            json.dump({'port': port, 'serial_number': _serial_number(port)}, f)
+    except IOError:
+        pass
+
 # Open a serial connection with Linduino
 class Linduino:
      
-    def __init__(self):
-        self.open()
+    def __init__(self, port = None):
+        self.open(port)
         
     def __del__(self):
         self.close()
@@ -70,40 +152,30 @@ class Linduino:
     def __exit__(self, a, b, c):
         self.close()
 
-    def open(self):
-        print "\nLooking for COM ports ..."
-        ports = get_available_ports()
-        print "Available ports: " + str(ports) + "\n"
-        print "Looking for Linduino ..." 
-        for port in ports:
-            try:
-                testser = serial.Serial(port, 115200, timeout = 0.5) 
-            except:
-                continue
-            
-            time.sleep(2)   # A delay is needed for the Linduino to reset
-
-            try:
-                id_linduino = testser.read(50) # Remove the hello from buffer
-
-                # Get ID string
-                testser.write("i") 
-                id_linduino = testser.read(50)
-                if id_linduino[20:25] == "DC590":
-                    Linduino = port
-            except:
-                continue
-            finally:
-                testser.close()
+    # Connects to port if given, otherwise to the cached port if it still
+    # answers, otherwise to the first Linduino found on any port
+    def open(self, port = None):
+        ser = None
+        if port is None:
+            port = _load_cached_port()
+            if port is not None:
+                ser = probe_port(port)
+            if ser is None:
+                print("\nLooking for COM ports ...")
+                ports = [p for p in get_available_ports() if p != port]
+                print("Available ports: " + str(ports) + "\n")
+                print("Looking for Linduino ...")
+                port, ser = find_linduino(ports)
+        else:
+            ser = probe_port(port)
         
-        try:
-            # Open serial port
-            self.port = serial.Serial(Linduino, 115200, timeout = 0.05)
-            time.sleep(2)       # A delay is needed for the Linduino to reset
-            self.port.read(50)  # Remove the hello from buffer
-            print "    Found Linduino!!!!"
-        except:
-            print "    Linduino was not detected"
+        if ser is None:
+            print("    Linduino was not detected")
+            return
+        ser.timeout = 0.05
+        self.port = ser
+        _save_cached_port(port)
+        print("    Found Linduino!!!!")
         
     def close(self):
         try:
@@ -115,6 +187,8 @@ class Linduino:
     def transfer_packets(self, send_packet, return_size = 0):
         try:
             if len(send_packet) > 0:
+                if not isinstance(send_packet, bytes):
+                    send_packet = send_packet.encode('ascii')      # DC590 strings
                 self.port.write(send_packet)                       # Send packet
             if return_size > 0:            
                 return self.port.read(return_size) # Receive packet
@@ -133,10 +207,10 @@ if __name__ == "__main__":
     try:
         linduino = Linduino() # Look for the DC590
 
-        linduino.port.write('i')
-        print "\n" + linduino.port.read(50)
+        linduino.port.write(b'i')
+        print("\n" + str(linduino.port.read(50)))
         
     finally:
         linduino.close()
 
-    print "Test Complete"  
\ No newline at end of file
+    print("Test Complete")  
\ No newline at end of file
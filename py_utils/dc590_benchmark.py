@@ -0,0 +1,115 @@
+# --------------------LICENSE AGREEMENT----------------------------------------
+# Copyright (c) 2020 Analog Devices, Inc.  All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+#   - Redistributions of source code must retain the above copyright notice, 
+#   this list of conditions and the following disclaimer.
+#   - Redistributions in binary form must reproduce the above copyright notice, 
+#   this list of conditions and the following disclaimer in the documentation 
+#   and/or other materials provided with the distribution.  
+#   - Modified versions of the software must be conspicuously marked as such.
+#   - This software is licensed solely and exclusively for use with 
+#   processors/products manufactured by or for Analog Devices, Inc.
+#   - This software may not be combined or merged with other code in any manner 
+#   that would cause the software to become subject to terms and conditions 
+#   which differ from those listed here.
+#   - Neither the name of Analog Devices, Inc. nor the names of its 
+#   contributors may be used to endorse or promote products derived from this 
+#   software without specific prior written permission.
+#   - The use of this software may or may not infringe the patent rights of  
+#   one or more patent holders.  This license does not release you from the 
+#   requirement that you obtain separate licenses from these patent holders 
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, 
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR  
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR 
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT; 
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; 
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR  
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# 2020-02-24-7CBSD SLA
+# -----------------------------------------------------------------------------
+'''
+Micro-benchmark for the DC590 string codec in AvalonMM_packets.
+
+Times the original string-building packet_to_DC590 / DC590_to_packet
+(kept below for reference) against encode_DC590 / decode_DC590 on random
+packets from 16 bytes to 16 KB, checks they produce the same result and
+prints the best of a few runs for each.
+
+Example command line:
+python dc590_benchmark.py --max-size 4096 --repeats 20
+'''
+
+import argparse
+import os
+import timeit
+
+import AvalonMM_packets as av_pack
+
+SIZES = [16, 256, 1024, 4096, 16384]
+
+# The codec as it was before encode_DC590/decode_DC590, for comparison
+def original_packet_to_DC590(packet, read_bytes):
+    dc590_string = ""
+    for x in range(0,len(packet)):
+        dc590_string += "S" + hex(packet[x])
+        if packet[x] < 0x10:
+            dc590_string = dc590_string.replace('x', '')
+        else:
+            dc590_string = dc590_string.replace('0x', '')
+    if read_bytes > 0:
+        for x in range(0,2*read_bytes + 4):
+            dc590_string += 'R'
+    dc590_string = 'x'+ dc590_string.upper() + 'X'
+    return dc590_string
+
+def original_DC590_to_packet(string):
+    packet = [];
+    for x in range(0, len(string), 2):
+        try:
+            packet.append((int(string[x],16)<<4) + (int(string[x+1],16)))
+        except:
+            packet.append((int(string[x],16)))
+    return packet
+
+def best_time(func, args, repeats):
+    # Seconds per call, best of `repeats` batches
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeats, number)) / number
+
+def run(sizes, repeats):
+    print('{0:>8s}{1:>8s}{2:>14s}{3:>14s}{4:>10s}'.format('bytes', '', 'original', 'new', 'speedup'))
+    for size in sizes:
+        packet = bytearray(os.urandom(size))
+        response = original_packet_to_DC590(list(packet), 0)[1:-1].replace('S', '')
+
+        assert av_pack.encode_DC590(packet, size) == original_packet_to_DC590(list(packet), size)
+        assert list(av_pack.decode_DC590(response)) == original_DC590_to_packet(response)
+
+        for name, old, new, args in [
+                ('encode', original_packet_to_DC590, av_pack.encode_DC590, (packet, size)),
+                ('decode', original_DC590_to_packet, av_pack.decode_DC590, (response,))]:
+            old_s = best_time(old, args, repeats)
+            new_s = best_time(new, args, repeats)
+            print('{0:8d}{1:>8s}{2:11.1f} us{3:11.1f} us{4:9.0f}x'.format(
+                size, name, old_s * 1e6, new_s * 1e6, old_s / new_s))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the DC590 string codec')
+    parser.add_argument('--max-size', type=int, default=SIZES[-1],
+                        help='largest packet size in bytes eg: 4096')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='timing runs per case, the fastest is kept')
+    args = parser.parse_args()
+
+    run([s for s in SIZES if s <= args.max_size], args.repeats)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2015-2019 Analog Devices, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+#
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+"""Channel de-interleaving for multi-channel ADC captures.
+
+Capture buffers come back with the channels interleaved word by word
+(ch0, ch1, ... chN-1, ch0, ...). deinterleave() turns one into a
+(num_channels, num_samples) array without copying, and can sign-extend
+N-bit samples right-justified in 32-bit words (e.g. 24-bit AD7768 data) in
+the same pass.
+
+    ch_data = deinterleave(rxbuf.read(), 8, num_bits=24)
+    ch_data[3]      # channel 3
+"""
+
+import numpy as np
+
+def deinterleave(data, num_channels, num_bits=None, dtype=np.int32):
+    """Splits interleaved samples into channels
+       returns a (num_channels, num_samples) array
+       data: a bytes-like capture buffer (read as dtype) or an array
+       num_channels: channels interleaved in data; a trailing partial
+       frame is dropped
+       num_bits: if given, sign-extend num_bits-bit samples. This makes one
+       copy with each channel contiguous; without it the result is a
+       strided view of data.
+    """
+    if isinstance(data, np.ndarray):
+        samples = data.ravel()
+    else:
+        samples = np.frombuffer(data, dtype)
+    num_samples = len(samples) // num_channels
+    channels = samples[:num_samples * num_channels].reshape(num_samples, num_channels).T
+    if num_bits is None:
+        return channels
+    return sign_extend(channels, num_bits)
+
+def sign_extend(data, num_bits, out=None):
+    """Sign-extends num_bits-bit values right-justified in 32-bit words
+       returns an int32 array, C-contiguous unless out is given
+       data: integer array, any layout; bits above num_bits are ignored
+       num_bits: sample width, 1 to 32
+       out: int32 array to write into, may be data itself if it is int32
+    """
+    words = np.asarray(data)
+    if words.dtype.kind in 'iu' and words.dtype.itemsize == 4:
+        words = words.view(np.int32)
+    else:
+        words = words.astype(np.int32)
+    if out is None:
+        out = np.empty(words.shape, dtype=np.int32)
+    shift = 32 - num_bits
+    # Move the sign bit to bit 31 and shift back arithmetically
+    np.left_shift(words, shift, out=out)
+    out >>= shift
+    return out
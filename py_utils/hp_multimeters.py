@@ -40,7 +40,14 @@
 # 2019-01-10-7CBSD SLA
 # -----------------------------------------------------------------------
 
-import visa
+import os
+
+import numpy as np
+
+try:
+    import visa
+except ImportError:     # Only the simulated meters work without pyvisa
+    visa = None
 
 def hp34401a_lcd_disp(hp_meter, message):
     """Displays up to 12 charaters on the hp33401a
@@ -69,6 +76,32 @@ def hp34401a_read_voltage_rng_res(hp_meter , v_range, v_resolution):
     return float(hp_meter.read())
 
 
+def hp34401a_config_voltage(hp_meter, v_range="DEF", v_resolution="DEF",
+                            samples_per_trigger=1, triggers=1, trigger_source="IMM"):
+    """Configures DC voltage measurement once, so repeated reads don't
+       redo the range and trigger setup the way MEAS? does
+       hp_meter: the instance of the meter
+       v_range: the desired voltage range
+       v_resolution: the desired resolution
+       samples_per_trigger: readings taken per trigger, 1 to 50000
+       triggers: triggers accepted per READ?, 1 to 50000
+       trigger_source: IMM, BUS or EXT
+    """
+    hp_meter.write("CONF:VOLT:DC " + str(v_range) + "," + str(v_resolution))
+    hp_meter.write("TRIG:SOUR " + str(trigger_source))
+    hp_meter.write("SAMP:COUN " + str(samples_per_trigger))
+    hp_meter.write("TRIG:COUN " + str(triggers))
+
+def hp34401a_read_voltages(hp_meter):
+    """Takes the readings set up by hp34401a_config_voltage
+       returns samples_per_trigger * triggers voltages as a NumPy array,
+       from one bulk read. The visa timeout has to cover all of them.
+       hp_meter: the instance of the meter
+    """
+    hp_meter.write("READ?")
+    return np.array(hp_meter.read().split(","), dtype=float)
+
+
 def hp3458a_lcd_disp(hp_meter, message):
     """Displays up to 16 charaters on the hp2458a
        hp_meter: the instance of the meter
@@ -104,10 +137,57 @@ def hp3458a_read_voltage(hp_meter):
     hp_meter.write("TARM SGL")
     return float(hp_meter.read())
 
-def resource_manager():
+# numpy dtype of each packed 3458A output format, all big-endian
+HP3458A_FORMATS = {"SINT": ">i2", "DINT": ">i4", "SREAL": ">f4", "DREAL": ">f8"}
+
+def hp3458a_config_readings(hp_meter, num_readings, output_format="DREAL"):
+    """Sets the meter up to take num_readings per trigger arm and send them
+       packed in binary instead of as ASCII
+       returns the scale factor for the integer formats (1.0 otherwise)
+       hp_meter: the instance of the meter, after hp3458a_init
+       num_readings: readings per trigger arm (NRDGS)
+       output_format: SINT, DINT, SREAL or DREAL
+    """
+    hp_meter.write("TARM HOLD")
+    hp_meter.write("NRDGS " + str(num_readings) + ",AUTO")
+    hp_meter.write("OFORMAT " + output_format)
+    if output_format in ("SINT", "DINT"):
+        return float(hp_meter.query("ISCALE?"))
+    return 1.0
+
+def hp3458a_read_voltages(hp_meter, num_readings, output_format="DREAL", scale=1.0):
+    """Arms the meter once and reads the readings set up by
+       hp3458a_config_readings in one bulk read
+       returns the voltages as a NumPy float array
+       hp_meter: the instance of the meter
+       num_readings: the num_readings passed to hp3458a_config_readings
+       output_format: the output_format passed to hp3458a_config_readings
+       scale: the scale factor hp3458a_config_readings returned
+    """
+    dtype = np.dtype(HP3458A_FORMATS[output_format])
+    hp_meter.write("TARM SGL")
+    raw = hp_meter.read_bytes(num_readings * dtype.itemsize)
+    return np.frombuffer(raw, dtype=dtype) * scale
+
+
+def resource_manager(simulated=None, **sim_options):
     """Connect to the resource manager
        returns the visa avalable resources
+       simulated: "34401A" or "3458A" to get simulated meters instead (see
+       simulated_multimeters); defaults to the HP_MULTIMETERS_SIM
+       environment variable, so existing scripts can run without hardware
+       sim_options: latency, noise, reading_time, seed, instruments
     """
+    if simulated is None:
+        simulated = os.environ.get("HP_MULTIMETERS_SIM")
+    if simulated:
+        try:
+            from . import simulated_multimeters
+        except ImportError:
+            import simulated_multimeters
+        return simulated_multimeters.SimulatedResourceManager(simulated, **sim_options)
+    if visa is None:
+        raise ImportError("pyvisa is needed to talk to real meters")
     return visa.ResourceManager()
 
 if __name__ == "__main__":
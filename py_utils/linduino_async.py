@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2015-2019 Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+"""
+    Description:
+        asyncio front end for Linduinos running the DC590 enhanced sketch,
+        so one process can drive several of them at once. Each Linduino
+        gets its own worker thread for the blocking serial calls; requests
+        to the same Linduino run in order, requests to different ones
+        overlap.
+
+        async def main():
+            async with await AsyncLinduino.open('/dev/ttyACM0') as a, \
+                       await AsyncLinduino.open('/dev/ttyACM1') as b:
+                ids = await asyncio.gather(a.transfer_packets('i', 50),
+                                           b.transfer_packets('i', 50))
+"""
+###############################################################################
+# Libraries
+###############################################################################
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import connect_to_linduino as duino
+
+DEFAULT_TIMEOUT = 1.0   # Seconds allowed for each transfer
+
+class AsyncLinduino:
+
+    def __init__(self, linduino, timeout = DEFAULT_TIMEOUT):
+        self.linduino = linduino    # Connected connect_to_linduino.Linduino
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers = 1)
+
+    # Connects like connect_to_linduino.Linduino(port), without blocking
+    # the event loop while ports are probed
+    @classmethod
+    async def open(cls, port = None, timeout = DEFAULT_TIMEOUT):
+        loop = asyncio.get_running_loop()
+        linduino = await loop.run_in_executor(None, duino.Linduino, port)
+        if not hasattr(linduino, 'port'):
+            raise IOError("Linduino was not detected" + ("" if port is None else " on " + port))
+        return cls(linduino, timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, a, b, c):
+        await self.close()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.linduino.close)
+        self._executor.shutdown()
+
+    # Sends send_packet and returns exactly return_size bytes of response
+    # (None if return_size is 0). Raises TimeoutError if they don't all
+    # arrive within timeout seconds; serial errors are raised as is.
+    async def transfer_packets(self, send_packet, return_size = 0, timeout = None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._transfer, send_packet,
+                                          return_size, self.timeout if timeout is None else timeout)
+
+    def _transfer(self, send_packet, return_size, timeout):
+        port = self.linduino.port
+        deadline = time.monotonic() + timeout
+        # Drop anything left over from a request that timed out
+        port.reset_input_buffer()
+        if len(send_packet) > 0:
+            if isinstance(send_packet, str):
+                send_packet = send_packet.encode('ascii')
+            port.write(send_packet)
+        if return_size <= 0:
+            return None
+        
+        response = bytearray()
+        while len(response) < return_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("{0}: got {1:d} of {2:d} bytes in {3:g} s".format(
+                    port.port, len(response), return_size, timeout))
+            port.timeout = remaining
+            response += port.read(return_size - len(response))
+        return bytes(response)
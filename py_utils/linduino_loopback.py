@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2016-2019 Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+"""
+    Description:
+        Loopback stand-in for a Linduino running the DC590 enhanced sketch
+        with an SPI to Avalon MM bridge behind it, so the packet and DC590
+        encode/decode paths can be exercised without hardware.
+"""
+###############################################################################
+# Libraries
+###############################################################################
+import os
+import threading
+import time
+
+import AvalonMM_packets as av_pack
+
+# What the DC590 sketch answers to 'i'
+ID_STRING = b"USBSPI,PIC,01,01,DC,DC590,----------------------\n"
+# Characters following each DC590 command that takes an argument
+ARGUMENT_LENGTH = {'S': 2, 'M': 1}
+
+# Serial port look-alike: writes are parsed as DC590 commands, reads return
+# the hex digits the 'R' commands clocked out
+class LoopbackSerial:
+
+    def __init__(self, memory_size = 65536, latency = 0.0):
+        self.port = 'loopback'                # Port name, as on serial.Serial
+        self.timeout = None                   # Unused; reads never block
+        self.memory = bytearray(memory_size)  # Avalon address space
+        self.latency = latency                # Seconds added to every write()
+        self.writes = 0                       # Number of write() calls
+        self._request = bytearray()           # Bytes sent with 'S' this frame
+        self._response = bytearray()          # Bytes the bridge has to send back
+        self._read_buffer = bytearray()       # Hex digits waiting to be read
+        self._partial = ''                    # Command split across write() calls
+        
+    def close(self):
+        pass
+
+    def write(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('ascii')
+        length = len(data)
+        self.writes += 1
+        time.sleep(self.latency)
+        data = self._partial + data
+        self._partial = ''
+        x = 0
+        while x < len(data):
+            command = data[x]
+            if command in 'SM' and x + ARGUMENT_LENGTH[command] >= len(data):
+                self._partial = data[x:]
+                break
+            if command == 'x':      # CS low, start of a frame
+                self._request = bytearray()
+                self._response = bytearray()
+            elif command == 'X':    # CS high, end of a frame
+                self._execute()
+                self._response = bytearray()
+            elif command == 'S':
+                self._request.append(int(data[x+1:x+3], 16))
+            elif command == 'R':
+                self._execute()
+                byte = self._response.pop(0) if self._response else av_pack.CONST_BYTES_IDLE_CHAR
+                self._read_buffer += '{0:02X}'.format(byte).encode('ascii')
+            elif command == 'i':
+                self._read_buffer += ID_STRING
+            x += 1 + ARGUMENT_LENGTH.get(command, 0)
+        return length
+
+    @property
+    def in_waiting(self):
+        return len(self._read_buffer)
+
+    def reset_input_buffer(self):
+        del self._read_buffer[:]
+
+    def read(self, size = 1):
+        data = bytes(self._read_buffer[:size])
+        del self._read_buffer[:size]
+        return data
+
+    def _execute(self):
+        # Runs the request sent so far and queues the framed response
+        if not self._request:
+            return
+        body = av_pack.decode_packet(self._request)
+        self._request = bytearray()
+        trans_type = body[0]
+        size = (body[2] << 8) | body[3]
+        address = (body[4] << 24) | (body[5] << 16) | (body[6] << 8) | body[7]
+        sequential = trans_type in (av_pack.CONST_SEQUENTIAL_WRITE, av_pack.CONST_SEQUENTIAL_READ)
+        addresses = [(address + (x if sequential else 0)) % len(self.memory) for x in range(size)]
+        
+        if trans_type in (av_pack.CONST_SEQUENTIAL_READ, av_pack.CONST_NON_SEQUENTIAL_READ):
+            reply = bytearray(self.memory[a] for a in addresses)
+        else:
+            for a, byte in zip(addresses, body[8:]):
+                self.memory[a] = byte
+            reply = bytearray([trans_type | 0x80, 0, (size>>8) & 0xFF, size & 0xFF])
+        self._response += av_pack.encode_frame(reply)
+
+# Drop-in for connect_to_linduino.Linduino that talks to a LoopbackSerial
+class LoopbackLinduino:
+
+    def __init__(self, memory_size = 65536, latency = 0.0):
+        self.port = LoopbackSerial(memory_size, latency)
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, a, b, c):
+        self.close()
+
+    def close(self):
+        self.port.close()
+        return 1
+
+    def transfer_packets(self, send_packet, return_size = 0):
+        try:
+            if len(send_packet) > 0:
+                self.port.write(send_packet)                       # Send packet
+            if return_size > 0:            
+                return self.port.read(return_size) # Receive packet
+            else:
+                return None # return_size of 0 implies send only
+        except:
+            return 0
+
+# A LoopbackSerial behind a pseudo-terminal (POSIX only), so code that opens
+# a real serial port by name can be pointed at port_name instead
+class PtyLinduino:
+
+    def __init__(self, memory_size = 65536, latency = 0.0):
+        import tty  # termios is POSIX only
+        self.loopback = LoopbackSerial(memory_size, latency)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port_name = os.ttyname(self._slave)
+        self._thread = threading.Thread(target = self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, a, b, c):
+        self.close()
+
+    def close(self):
+        for fd in (self._slave, self._master):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._thread.join(1)
+
+    def _serve(self):
+        while True:
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return          # Closed
+            if not data:
+                return
+            self.loopback.write(data)
+            if self.loopback.in_waiting:
+                os.write(self._master, self.loopback.read(self.loopback.in_waiting))
@@ -0,0 +1,165 @@
+# ---------------------------------------------------------------------------
+# Copyright (c) ?YEAR? Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+# A byte offset is kept for every INDEX_ROWS-th sample row so sub-range
+# reads can seek close to where they start instead of parsing from the top.
+INDEX_ROWS = 65536
+# Bytes of the file scanned per pass when building the row index
+INDEX_CHUNK = 1 << 24
+
+def load_pscope(path, channels=None, start=0, stop=None, dtype=None):
+    """Reads a PScope .adc file into a (num_channels, num_samples) array.
+
+    channels picks a subset of channels (0-based), start/stop a range of
+    sample rows. One row per channel, so load_pscope(path) can be fed
+    straight back to save_for_pscope(..., *data).
+    """
+    return PscopeFile(path).read(channels, start, stop, dtype)
+
+class PscopeFile:
+    """Header of a PScope .adc file, with lazy access to the samples.
+
+        adc = PscopeFile('capture.adc')
+        ch1 = adc.read(channels=[1], start=1000000, stop=1065536)[0]
+
+    Only the header is parsed up front. Reads that don't start at the first
+    row build an index of row offsets from a memory map of the file (once,
+    on first use) and seek to the nearest indexed row.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dc_num = None
+        self.ltc_num = None
+        self.num_channels = 0
+        self.num_samples = 0
+        self.num_bits = []
+        self.min_val = []
+        self.max_val = []
+        self._row_offsets = None
+        self._data_offset = 0
+        with open(path, 'rb') as in_file:
+            while True:
+                line = in_file.readline()
+                if not line[:1].isalpha() or line.startswith(b'End'):
+                    break
+                self._parse_header_line(line.decode('ascii').strip())
+                self._data_offset = in_file.tell()
+        if len(self.num_bits) != self.num_channels:
+            raise ValueError("{0}: expected {1:d} RawData lines, found {2:d}".format(
+                path, self.num_channels, len(self.num_bits)))
+
+    def _parse_header_line(self, line):
+        fields = line.split(',')
+        if fields[0] == 'Retainers':
+            self.num_channels = int(fields[2])
+            self.num_samples = int(fields[3])
+        elif fields[0] == 'DemoID':
+            self.dc_num = fields[1]
+            self.ltc_num = fields[2]
+        elif fields[0] == 'RawData':
+            self.num_bits.append(int(fields[3]))
+            self.min_val.append(int(fields[4]))
+            self.max_val.append(int(fields[5]))
+
+    def read(self, channels=None, start=0, stop=None, dtype=None):
+        """Returns samples [start, stop) of the given channels as a
+        (len(channels), stop - start) array. dtype defaults to whatever the
+        text parses as (int64 for integer captures)."""
+        if channels is None:
+            channels = range(self.num_channels)
+        channels = list(channels)
+        if any(ch < 0 or ch >= self.num_channels for ch in channels):
+            raise ValueError("channels must be between 0 and {0:d}".format(self.num_channels - 1))
+        start, stop, _ = slice(start, stop).indices(self.num_samples)
+        num_rows = max(stop - start, 0)
+        if num_rows == 0 or not channels:
+            return np.empty((len(channels), num_rows), dtype=dtype or np.int64)
+
+        offset, skip = self._seek_row(start)
+        # Each row is "v0, ,v1, ,v2": splitting on "," puts channel i in
+        # column 2*i and keeps the parse in pandas' C reader.
+        columns = sorted(set(2 * ch for ch in channels))
+        with open(self.path, 'rb') as in_file:
+            in_file.seek(offset)
+            frame = pd.read_csv(in_file, header=None, skiprows=skip, nrows=num_rows,
+                                usecols=columns, dtype=dtype, engine='c')
+        if len(frame) < num_rows:
+            raise ValueError("{0}: header says {1:d} samples, file ends at {2:d}".format(
+                self.path, self.num_samples, start + len(frame)))
+        return np.stack([frame[2 * ch].to_numpy() for ch in channels])
+
+    def _seek_row(self, row):
+        # (byte offset, rows still to skip) for the start of sample row `row`
+        if row < INDEX_ROWS:
+            return self._data_offset, row
+        if self._row_offsets is None:
+            self._row_offsets = self._index_rows()
+        block = min(row // INDEX_ROWS, len(self._row_offsets) - 1)
+        return self._row_offsets[block], row - block * INDEX_ROWS
+
+    def _index_rows(self):
+        data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        offsets = [self._data_offset]
+        rows_seen = 0
+        for chunk_start in range(self._data_offset, len(data), INDEX_CHUNK):
+            ends = np.flatnonzero(data[chunk_start:chunk_start + INDEX_CHUNK] == ord('\n'))
+            # Row r starts one past the end of row r - 1; keep rows that are
+            # a multiple of INDEX_ROWS.
+            first = -(rows_seen + 1) % INDEX_ROWS
+            offsets.extend((ends[first::INDEX_ROWS] + chunk_start + 1).tolist())
+            rows_seen += len(ends)
+            if rows_seen >= self.num_samples:
+                break
+        del data
+        return offsets[:(self.num_samples - 1) // INDEX_ROWS + 1]
+
+if __name__ == '__main__':
+    import sys
+    adc = PscopeFile(sys.argv[1] if len(sys.argv) > 1 else 'test.adc')
+    print('{0} {1}: {2:d} channels x {3:d} samples, {4} bits'.format(
+        adc.dc_num, adc.ltc_num, adc.num_channels, adc.num_samples, adc.num_bits))
+    data = adc.read()
+    for ch, samples in enumerate(data):
+        print('channel {0:d}: min {1}, max {2}, mean {3:.3f}'.format(
+            ch, samples.min(), samples.max(), samples.mean()))
@@ -40,9 +40,15 @@
 # 2019-01-10-7CBSD SLA
 # -----------------------------------------------------------------------
 
+import time
+from concurrent.futures import Future
+
 import connect_to_linduino as duino
 import AvalonMM_packets as av_pack
 
+# Deadlines must not move with the wall clock (time.monotonic is Python 3 only)
+_clock = getattr(time, 'monotonic', time.time)
+
 # Write data to the Avalon bus
 def transaction_write(dc2026, base, write_size, data):
     # Create the packet
@@ -75,6 +81,89 @@ def transaction_read(dc2026, base, read_size):
     data = av_pack.packet_to_data(data_packet)
     return data
     
+# Queues Avalon transactions and sends them as one DC590 command stream:
+# one serial write and one serial read for the whole batch instead of a
+# round trip per transaction. Each read()/write() returns a Future that
+# resolves to the decoded response once the batch is flushed.
+#
+#   with TransactionQueue(linduino) as queue:
+#       queue.write(0x10, 4, [0xE3, 0x36, 0x1A, 0x00])
+#       value = queue.read(0x10, 4)
+#   print(value.result())
+class TransactionQueue:
+
+    # The whole batch's response is read within RESPONSE_TIMEOUT seconds
+    # plus the time the hex characters take at the DC590's 115200 baud
+    RESPONSE_TIMEOUT = 0.5
+    CHARS_PER_SECOND = 115200 / 10.0
+
+    def __init__(self, dc2026, max_batch = None):
+        self.dc2026 = dc2026
+        self.max_batch = max_batch  # Flush automatically at this many transactions
+        self._pending = []          # (DC590 string, response length, future)
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, a, b, c):
+        self.flush()
+
+    def write(self, base, write_size, data):
+        packet = av_pack.encode_packet(av_pack.CONST_SEQUENTIAL_WRITE, write_size, base, data)
+        return self._queue(packet, 4)
+
+    def read(self, base, read_size):
+        packet = av_pack.encode_packet(av_pack.CONST_SEQUENTIAL_READ, read_size, base)
+        return self._queue(packet, read_size)
+
+    def _queue(self, packet, read_bytes):
+        future = Future()
+        command = av_pack.encode_DC590(packet, read_bytes)
+        # Every 'R' reads one byte back as two hex characters
+        self._pending.append((command, 2 * command.count('R'), future))
+        if self.max_batch is not None and len(self._pending) >= self.max_batch:
+            self.flush()
+        return future
+
+    # Sends everything queued and resolves the futures. If the serial port
+    # raises, every future in the batch gets the exception before it is
+    # re-raised.
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        total = sum(length for _, length, _ in pending)
+        try:
+            response = self._transfer(''.join(command for command, _, _ in pending), total)
+        except Exception as e:
+            for _, _, future in pending:
+                future.set_exception(e)
+            raise
+        
+        start = 0
+        for command, length, future in pending:
+            chunk = response[start:start + length]
+            start += length
+            if len(chunk) < length:
+                future.set_exception(IOError("DC590 response ended after {0:d} of {1:d} "
+                                             "characters".format(len(response), total)))
+                continue
+            try:
+                future.set_result(av_pack.packet_to_data(av_pack.DC590_to_packet(chunk)))
+            except ValueError as e:
+                future.set_exception(e)
+
+    # Writes the commands and keeps reading until total characters are in
+    # or the deadline passes; one read would stop at the port's timeout
+    def _transfer(self, commands, total):
+        port = self.dc2026.port
+        deadline = _clock() + self.RESPONSE_TIMEOUT + total / self.CHARS_PER_SECOND
+        port.write(commands.encode('ascii'))
+        response = bytearray()
+        while len(response) < total and _clock() < deadline:
+            response += port.read(total - len(response))
+        return bytes(response)
+    
 #*************************************************
 # Function Tests
 #*************************************************
@@ -83,12 +172,12 @@ if __name__ == "__main__":
     
     linduino = duino.Linduino() # Look for the Linduino
     try:
-        linduino.port.write("M3")
-        linduino.transfer_packets('G',0) # Set the GPIO HIGH
+        linduino.port.write(b"M3")
+        linduino.transfer_packets(b'G',0) # Set the GPIO HIGH
         
-        print transaction_write(linduino, 0, 4, [0xE3,0x36 ,0x1A, 0x00])
-        print transaction_read(linduino, 0, 4)
+        print(transaction_write(linduino, 0, 4, [0xE3,0x36 ,0x1A, 0x00]))
+        print(transaction_read(linduino, 0, 4))
          
     finally:
         linduino.close()
-    print "Test Complete"
\ No newline at end of file
+    print("Test Complete")
\ No newline at end of file
@@ -39,11 +39,87 @@
 # -----------------------------------------------------------------------
 
 import math as m
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Rows formatted per write; bounds the size of the text buffer
+BLOCK_ROWS = 65536
+
 def save_for_pscope(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num, *data):
     num_channels = len(data)
     if num_channels < 0 or num_channels > 16:
         raise ValueError("pass in a list for each channel (between 1 and 16)")
+    for i, ch in enumerate(data):
+        if len(ch) < num_samples:
+            raise ValueError("channel {0:d} has {1:d} samples, num_samples is {2:d}".format(
+                i + 1, len(ch), num_samples))
+
+    with open(out_path, 'w') as out_file:
+        out_file.write(_header(num_bits, is_bipolar, num_samples, dc_num, ltc_num, num_channels))
+        for start in range(0, num_samples, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, num_samples)
+            out_file.write(_format_rows([ch[start:stop] for ch in data]))
+        out_file.write('End\n')
+
+class PscopeWriter:
+    """Writes a PScope .adc file a chunk at a time, for captures that
+    arrive in pieces or don't fit in memory.
+
+        with PscopeWriter('capture.adc', 18, True, 2, 'DC0000', 'LTC1111') as w:
+            for ch0, ch1 in chunks:
+                w.write(ch0, ch1)
+
+    Samples go to a temporary file next to out_path; close() writes the
+    header with the final sample count and moves the samples in behind it.
+    """
 
+    def __init__(self, out_path, num_bits, is_bipolar, num_channels, dc_num, ltc_num):
+        if num_channels < 1 or num_channels > 16:
+            raise ValueError("num_channels must be between 1 and 16")
+        self.out_path = out_path
+        self.num_bits = num_bits
+        self.is_bipolar = is_bipolar
+        self.num_channels = num_channels
+        self.dc_num = dc_num
+        self.ltc_num = ltc_num
+        self.num_samples = 0
+        self._body = tempfile.TemporaryFile('w+', dir=os.path.dirname(os.path.abspath(out_path)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._body.close()
+
+    def write(self, *data):
+        """Appends one chunk per channel; all chunks must be the same length."""
+        if len(data) != self.num_channels:
+            raise ValueError("expected {0:d} channels, got {1:d}".format(self.num_channels, len(data)))
+        num_samples = len(data[0])
+        if any(len(ch) != num_samples for ch in data):
+            raise ValueError("channel chunks must be the same length")
+        for start in range(0, num_samples, BLOCK_ROWS):
+            self._body.write(_format_rows([ch[start:start + BLOCK_ROWS] for ch in data]))
+        self.num_samples += num_samples
+
+    def close(self):
+        if self._body.closed:
+            return
+        with open(self.out_path, 'w') as out_file:
+            out_file.write(_header(self.num_bits, self.is_bipolar, self.num_samples,
+                                   self.dc_num, self.ltc_num, self.num_channels))
+            self._body.seek(0)
+            shutil.copyfileobj(self._body, out_file)
+            out_file.write('End\n')
+        self._body.close()
+
+def _header(num_bits, is_bipolar, num_samples, dc_num, ltc_num, num_channels):
     full_scale = 1 << num_bits
     if is_bipolar:
         min_val = -full_scale // 2
@@ -52,21 +128,27 @@ def save_for_pscope(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num
         min_val = 0
         max_val = full_scale
 
-    with open(out_path, 'w') as out_file:
-        out_file.write('Version,115\n')
-        out_file.write('Retainers,0,{0:d},{1:d},1024,0,{2:0.15f},1,1\n'.format(num_channels, num_samples, 0.0))
-        out_file.write('Placement,44,0,1,-1,-1,-1,-1,10,10,1031,734\n')
-        out_file.write('DemoID,' + dc_num + ',' + ltc_num + ',0\n')
-        for i in range(num_channels):
-            out_file.write(
-                'RawData,{0:d},{1:d},{2:d},{3:d},{4:d},{5:0.15f},{3:e},{4:e}\n'.format(
-                    i+1, int(num_samples), int(num_bits), min_val, max_val, 1.0 ))
-        for samp in range(num_samples):
-            out_file.write(str(data[0][samp]))
-            for ch in range(1, num_channels):
-                out_file.write(', ,' + str(data[ch][samp]))
-            out_file.write('\n')
-        out_file.write('End\n')
+    header = ['Version,115\n',
+              'Retainers,0,{0:d},{1:d},1024,0,{2:0.15f},1,1\n'.format(num_channels, num_samples, 0.0),
+              'Placement,44,0,1,-1,-1,-1,-1,10,10,1031,734\n',
+              'DemoID,' + dc_num + ',' + ltc_num + ',0\n']
+    for i in range(num_channels):
+        header.append(
+            'RawData,{0:d},{1:d},{2:d},{3:d},{4:d},{5:0.15f},{3:e},{4:e}\n'.format(
+                i+1, int(num_samples), int(num_bits), min_val, max_val, 1.0 ))
+    return ''.join(header)
+
+def _format_rows(data):
+    # One string for a block of rows, ", ," between channels. Values print
+    # exactly as str() of each sample would; tolist() gives the same text
+    # for integer, bool and float64 arrays and is much faster than going
+    # through NumPy scalars.
+    columns = [map(str, ch.tolist() if _tolist_is_exact(ch) else ch) for ch in data]
+    rows = '\n'.join(map(', ,'.join, zip(*columns)))
+    return rows + '\n' if rows else ''
+
+def _tolist_is_exact(ch):
+    return isinstance(ch, np.ndarray) and (ch.dtype.kind in 'iub' or ch.dtype == np.float64)
 
 if __name__ == '__main__':
     num_bits = 16
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2015-2019 Analog Devices, Inc. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+#
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+"""In-process stand-ins for the HP 34401A and 3458A, for running and timing
+the hp_multimeters measurement loops without GPIB hardware.
+
+    rm = SimulatedResourceManager("34401A", latency=0.005, noise=10e-6)
+    hp34401a = rm.open_resource("GPIB0::22::INSTR", timeout=5000)
+    hp34401a.voltage = 1.25     # or a function of no arguments
+    print(hp34401a_read_voltage(hp34401a))
+
+Each write/read costs `latency` seconds, each reading `reading_time`
+seconds (the 3458A works this out from NPLC and LFREQ instead) and each
+function or range change `setup_time` seconds. A read that
+would take longer than the resource timeout raises SimulatedTimeoutError,
+as VISA would. Commands the meters don't understand raise ValueError so
+typos show up in tests.
+"""
+
+import re
+import time
+
+import numpy as np
+
+try:
+    from .hp_multimeters import HP3458A_FORMATS
+except ImportError:
+    from hp_multimeters import HP3458A_FORMATS
+
+class SimulatedTimeoutError(IOError):
+    pass
+
+class SimulatedResourceManager:
+    """Drop-in for visa.ResourceManager() that opens simulated meters.
+       model: "34401A" or "3458A", for every resource not in instruments
+       instruments: {resource_name: model} for a mix of meters
+       latency, noise, reading_time, setup_time, seed: passed to each meter
+    """
+    def __init__(self, model="34401A", instruments=None, latency=0.0, noise=0.0,
+                 reading_time=0.0, setup_time=0.0, seed=None):
+        self.model = model
+        self.instruments = dict(instruments or {})
+        self.options = dict(latency=latency, noise=noise, reading_time=reading_time,
+                            setup_time=setup_time)
+        self.rng = np.random.default_rng(seed)
+
+    def list_resources(self):
+        return tuple(self.instruments) or ("GPIB0::22::INSTR",)
+
+    def open_resource(self, resource_name, read_termination=None, timeout=2000, **kwargs):
+        meter = MODELS[self.instruments.get(resource_name, self.model)]
+        return meter(resource_name, read_termination, timeout, rng=self.rng, **self.options)
+
+    def close(self):
+        pass
+
+class _SimulatedMeter:
+    # Output is kept as bytes, so read() and read_bytes() can be mixed the
+    # way they are on a real bus
+
+    id_string = ""
+
+    def __init__(self, resource_name, read_termination=None, timeout=2000, latency=0.0,
+                 noise=0.0, reading_time=0.0, setup_time=0.0, rng=None):
+        self.resource_name = resource_name
+        self.read_termination = read_termination
+        self.timeout = timeout          # ms, like pyvisa
+        self.latency = latency
+        self.noise = noise
+        self.reading_time = reading_time
+        self.setup_time = setup_time
+        self.voltage = 0.0
+        self.display = ""
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self._output = bytearray()
+        self._busy = 0.0                # Seconds of readings owed by the next read
+
+    def __repr__(self):
+        return "<Simulated {0} at {1}>".format(self.id_string, self.resource_name)
+
+    def close(self):
+        pass
+
+    def write(self, command):
+        time.sleep(self.latency)
+        self.handle(command.strip())
+        return len(command)
+
+    def read(self):
+        self._wait()
+        end = self._output.find(b"\n")
+        end = len(self._output) if end < 0 else end + 1
+        message = bytes(self._output[:end])
+        del self._output[:end]
+        return message.decode("ascii").rstrip("\r\n")
+
+    def read_bytes(self, count):
+        self._wait()
+        if len(self._output) < count:
+            raise SimulatedTimeoutError("{0}: {1:d} of {2:d} bytes available".format(
+                self.resource_name, len(self._output), count))
+        data = bytes(self._output[:count])
+        del self._output[:count]
+        return data
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def readings(self, count):
+        """The next count readings of the input: voltage plus noise"""
+        voltage = self.voltage() if callable(self.voltage) else self.voltage
+        self._busy += count * self.reading_time
+        return voltage + self.noise * self.rng.standard_normal(count)
+
+    def setup(self):
+        """Charges for a function or range change"""
+        self._busy += self.setup_time
+
+    def respond(self, text):
+        self._output += (text + "\r\n").encode("ascii")
+
+    def _wait(self):
+        seconds, self._busy = self.latency + self._busy, 0.0
+        if seconds > self.timeout / 1000.0:
+            time.sleep(self.timeout / 1000.0)
+            raise SimulatedTimeoutError("{0}: timed out after {1:g} ms".format(
+                self.resource_name, self.timeout))
+        time.sleep(seconds)
+
+def _format_readings(values):
+    return ",".join("{0:+.8E}".format(v) for v in values)
+
+class Simulated34401A(_SimulatedMeter):
+
+    id_string = "HEWLETT-PACKARD,34401A,0,11-5-2"
+
+    def __init__(self, *args, **kwargs):
+        _SimulatedMeter.__init__(self, *args, **kwargs)
+        self.reset()
+
+    def reset(self):
+        self.samples_per_trigger = 1
+        self.triggers = 1
+        self.trigger_source = "IMM"
+
+    def handle(self, command):
+        name, _, args = command.partition(" ")
+        name = name.upper()
+        if name == "*IDN?":
+            self.respond(self.id_string)
+        elif name == "*RST":
+            self.reset()
+        elif name == "*CLS":
+            self._output = bytearray()
+        elif name == "DISP:TEXT:CLE":
+            self.display = ""
+        elif name == "DISP:TEXT":
+            self.display = args.strip("'\"")[:12]
+        elif name == "MEAS:VOLT:DC?":
+            self.reset()
+            self.setup()
+            self.respond(_format_readings(self.readings(1)))
+        elif name == "CONF:VOLT:DC":
+            self.reset()
+            self.setup()
+        elif name == "TRIG:SOUR":
+            self.trigger_source = args.upper()
+        elif name == "SAMP:COUN":
+            self.samples_per_trigger = int(args)
+        elif name == "TRIG:COUN":
+            self.triggers = int(args)
+        elif name == "READ?":
+            self.respond(_format_readings(self.readings(self.samples_per_trigger * self.triggers)))
+        else:
+            raise ValueError("34401A: unknown command " + repr(command))
+
+class Simulated3458A(_SimulatedMeter):
+
+    id_string = "HP3458A"
+
+    # Full scale of the integer formats, ISCALE? = range * 1.2 / FULL_SCALE
+    FULL_SCALE = {"SINT": 2**15 - 1, "DINT": 2**31 - 1}
+
+    def __init__(self, *args, **kwargs):
+        _SimulatedMeter.__init__(self, *args, **kwargs)
+        self.reset()
+
+    def reset(self):
+        self.num_readings = 1
+        self.output_format = "ASCII"
+        self.range = 1000.0
+        self.nplc = 10.0
+        self.line_freq = 60.0
+
+    def readings(self, count):
+        self._busy += count * self.nplc / self.line_freq
+        return _SimulatedMeter.readings(self, count)
+
+    def iscale(self):
+        return self.range * 1.2 / self.FULL_SCALE[self.output_format]
+
+    def handle(self, command):
+        name, _, args = command.partition(" ")
+        name = name.upper()
+        if name in ("RESET", "PRESET"):
+            self.reset()
+        elif name == "ID?":
+            self.respond(self.id_string)
+        elif name in ("TARM", "TRIG", "AZERO", "FIXEDZ", "TEST", "END"):
+            if name == "TARM" and args.upper() == "SGL":
+                self.trigger()
+        elif name == "FUNC":
+            self.setup()
+        elif name == "RANGE":
+            self.setup()
+            if not args.upper().startswith("AUTO"):
+                self.range = float(args.split(",")[0])
+        elif name == "NPLC":
+            self.nplc = float(args)
+        elif name == "LFREQ":
+            self.line_freq = 60.0 if args.upper() == "LINE" else float(args)
+        elif name == "DISP":
+            match = re.match(r"\d+\s*'?([^']*)", args)
+            self.display = match.group(1)[:16] if match else ""
+        elif name == "NRDGS":
+            self.num_readings = int(args.split(",")[0])
+        elif name == "OFORMAT":
+            self.output_format = args.upper()
+        elif name == "ISCALE?":
+            self.respond("{0:.8E}".format(self.iscale() if self.output_format in self.FULL_SCALE else 1.0))
+        else:
+            raise ValueError("3458A: unknown command " + repr(command))
+
+    def trigger(self):
+        values = self.readings(self.num_readings)
+        if self.output_format == "ASCII":
+            for v in values:
+                self.respond("{0:+.9E}".format(v))
+            return
+        dtype = np.dtype(HP3458A_FORMATS[self.output_format])
+        if self.output_format in self.FULL_SCALE:
+            limit = self.FULL_SCALE[self.output_format]
+            values = np.clip(np.round(values / self.iscale()), -limit, limit)
+        self._output += values.astype(dtype).tobytes()
+
+MODELS = {"34401A": Simulated34401A, "3458A": Simulated3458A}
@@ -38,7 +38,9 @@
 # 2020-02-24-7CBSD SLA
 # -----------------------------------------------------------------------------
 
+import functools
 import math as m
+import os
 import numpy as np
 
 NONE               = 0x00
@@ -54,8 +56,24 @@ DEF_WINDOW_TYPE = BLACKMAN_HARRIS_92
 
 BW = 3
 
+# Windows are cached (least recently used dropped first) since sweeps
+# analyze many records of the same length. Set the SIN_PARAMS_PRECOMPUTE
+# environment variable to build the default window for the power-of-two
+# sizes below at import.
+WINDOW_CACHE_SIZE = 32
+PRECOMPUTE_SIZES = [2**k for k in range(10, 21)]
+
+# SinParamsAccumulator FFTs at most this many samples' worth of whole
+# records at a time, however large the chunk passed to add()
+ACCUMULATOR_BATCH_SAMPLES = 2**22
+
 def sin_params(data, window_type=DEF_WINDOW_TYPE, mask=None, num_harms=9, spur_in_harms = True):
     fft_data = windowed_fft_mag(data, window_type)
+    return sin_params_from_fft(fft_data, window_type, mask, num_harms, spur_in_harms)
+
+def sin_params_from_fft(fft_data, window_type=DEF_WINDOW_TYPE, mask=None, num_harms=9, spur_in_harms = True):
+    """sin_params() on a magnitude spectrum from windowed_fft_mag, or an
+    averaged one from SinParamsAccumulator."""
     harm_bins, harms, harm_bws = find_harmonics(fft_data, num_harms)
     spur, spur_bw = find_spur(spur_in_harms, harm_bins[0], harms, harm_bws, fft_data, window_type)
 
@@ -91,9 +109,135 @@ def sin_params(data, window_type=DEF_WINDOW_TYPE, mask=None, num_harms=9, spur_i
 
     return (harmonics, snr, thd, sinad, enob, sfdr, floor)
 
-def window(size, window_type=DEF_WINDOW_TYPE):
+def sin_params_batch(data, window_type=DEF_WINDOW_TYPE, mask=None, num_harms=9, spur_in_harms = True):
+    """sin_params() for a stack of equal-length records.
+
+    data is an (n_records, n_samples) array. The windowed FFT, harmonic
+    search, auto mask and noise sums are done for all records at once.
+    mask, if given, is either one mask for all records or one per record.
+    Returns a structured array with one row per record, with fields snr,
+    thd, sinad, enob, sfdr and floor (as returned by sin_params), plus harm
+    and harm_bin holding the noise-corrected harmonic powers and their bins.
+    """
+    fft_data = windowed_fft_mag_batch(data, window_type)
+    n_rec, n = fft_data.shape
+    harm_bins, harms, harm_bws = find_harmonics_batch(fft_data, num_harms)
+
+    if spur_in_harms:
+        index = np.argmax(harms[:, 1:], axis=1) + 1
+        spur = harms[np.arange(n_rec), index]
+        spur_bw = harm_bws[np.arange(n_rec), index]
+    else:
+        spur, spur_bw = np.array([find_spur_in_data(f, window_type, b)
+                                  for f, b in zip(fft_data, harm_bins[:, 0])]).T
+
+    if mask is None:
+        mask = calculate_auto_mask_batch(fft_data, harm_bins, window_type)
+    mask = np.broadcast_to(mask, fft_data.shape)[:, :n-1]
+    noise = np.cumsum(np.where(mask, fft_data[:, :n-1] * fft_data[:, :n-1], 0.0), axis=1)[:, -1]
+    noise_bins = np.count_nonzero(mask, axis=1)
+
+    average_noise = noise / np.maximum(1, noise_bins)
+    noise = average_noise * (n - 1)
+    harms = harms - average_noise[:, np.newaxis] * harm_bws
+    spur = spur - average_noise * spur_bw
+
+    signal = harms[:, 0]
+    harm_dist = np.zeros(n_rec)
+    for i in range(1, min(5, num_harms)):
+        harm_dist = harm_dist + harms[:, i]
+
+    results = np.zeros(n_rec, dtype=[('snr', float), ('thd', float), ('sinad', float),
+                                     ('enob', float), ('sfdr', float), ('floor', float),
+                                     ('harm', float, (num_harms,)),
+                                     ('harm_bin', int, (num_harms,))])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        results['floor'] = 10*np.log10(average_noise / signal) # dBc
+        results['snr'] = 10*np.log10(signal / noise)
+        results['thd'] = np.where(harm_dist > 0, 10*np.log10(harm_dist / signal), 0)
+        results['sinad'] = 10*np.log10(signal / (harm_dist + noise))
+        results['sfdr'] = np.where(spur > 0, 10*np.log10(signal / spur), 0)
+    results['enob'] = (results['sinad'] - 1.76) / 6.02
+    results['harm'] = harms
+    results['harm_bin'] = harm_bins
+    return results
+
+class SinParamsAccumulator:
+    """Power-averages the spectra of many records for sin_params analysis.
+
+    Feed it records or arbitrary chunks of a long stream with add(); whole
+    record_size blocks are windowed and FFT'd as they complete, in batches
+    of at most ACCUMULATOR_BATCH_SAMPLES, and leftover samples wait for the
+    next chunk. Memory stays bounded however large a chunk is. results() returns the same
+    tuple as sin_params() for the averaged spectrum.
+    """
+
+    def __init__(self, record_size, window_type=DEF_WINDOW_TYPE, num_harms=9, spur_in_harms = True):
+        self.record_size = int(record_size)
+        self.window_type = window_type
+        self.num_harms = num_harms
+        self.spur_in_harms = spur_in_harms
+        self.reset()
+
+    def reset(self):
+        self.num_records = 0
+        self._power = np.zeros(self.record_size // 2 + 1)
+        self._pending = np.zeros(0)
+
+    def add(self, data):
+        data = np.ravel(data)
+        if len(self._pending) > 0:
+            # Top up the leftover samples from the last chunk first
+            fill = min(self.record_size - len(self._pending), len(data))
+            self._pending = np.concatenate((self._pending, data[:fill]))
+            data = data[fill:]
+            if len(self._pending) == self.record_size:
+                self._add_records(self._pending[np.newaxis, :])
+                self._pending = np.zeros(0)
+        # Slice the rest a batch at a time, so a memory-mapped capture is
+        # only read in bounded pieces
+        num_records = len(data) // self.record_size
+        batch = max(1, ACCUMULATOR_BATCH_SAMPLES // self.record_size)
+        for start in range(0, num_records, batch):
+            stop = min(start + batch, num_records)
+            self._add_records(data[start * self.record_size:stop * self.record_size]
+                              .reshape(stop - start, self.record_size))
+        if len(data) > num_records * self.record_size:
+            self._pending = np.array(data[num_records * self.record_size:], dtype=np.float64)
+        return self.num_records
+
+    def _add_records(self, records):
+        fft_data = windowed_fft_mag_batch(records, self.window_type)
+        self._power += np.sum(fft_data * fft_data, axis=0)
+        self.num_records += len(records)
+
+    def spectrum(self):
+        """RMS average of the magnitude spectra added so far."""
+        if self.num_records == 0:
+            raise ValueError("No complete records added yet")
+        return np.sqrt(self._power / self.num_records)
+
+    def results(self, mask=None):
+        return sin_params_from_fft(self.spectrum(), self.window_type, mask,
+                                   self.num_harms, self.spur_in_harms)
+
+def window(size, window_type=DEF_WINDOW_TYPE, dtype=np.float64):
+    """Returns the normalized window, or None for NONE.
+
+    Windows come from an LRU cache keyed by (size, window_type, dtype) and
+    are read-only; copy before modifying.
+    """
     if window_type == NONE:
         return None
+    return _cached_window(int(size), window_type, np.dtype(dtype))
+
+@functools.lru_cache(maxsize=WINDOW_CACHE_SIZE)
+def _cached_window(size, window_type, dtype):
+    win = _make_window(size, window_type).astype(dtype, copy=False)
+    win.flags.writeable = False
+    return win
+
+def _make_window(size, window_type):
     if window_type == HAMMING:
         return _one_cos(size, 0.54, 0.46, 1.586303)
     elif window_type == HANN:
@@ -110,6 +254,21 @@ def window(size, window_type=DEF_WINDOW_TYPE):
         return _three_cos(size, 0.35875, 0.48829, 0.14128, 0.01168, 1.968888)
     else:
          raise ValueError("Unknown window type")   
+
+def precompute_windows(sizes=PRECOMPUTE_SIZES, window_types=(DEF_WINDOW_TYPE,), dtype=np.float64):
+    """Fills the window cache ahead of time. Only the most recent
+    WINDOW_CACHE_SIZE windows are kept.
+    """
+    for window_type in window_types:
+        for size in sizes:
+            window(size, window_type, dtype)
+
+def window_cache_info():
+    """Returns (hits, misses, maxsize, currsize) for the window cache."""
+    return _cached_window.cache_info()
+
+def window_cache_clear():
+    _cached_window.cache_clear()
     
 def _one_cos(n, a0, a1, norm):
     t = np.linspace(0, 1, n, False)
@@ -126,83 +285,171 @@ def _three_cos(n, a0, a1, a2, a3, norm):
     win = a0 - a1*np.cos(2*np.pi * t) + a2*np.cos(4*np.pi * t) - a3*np.cos(6*np.pi * t)
     return win * norm
 
-def windowed_fft_mag(data, window_type=BLACKMAN_HARRIS_92):
-    n = len(data) 
-    data = np.array(data, dtype=np.float64)
+def windowed_fft_mag(data, window_type=BLACKMAN_HARRIS_92, in_place=False, dtype=np.float64):
+    """Single-sided magnitude spectrum of the windowed, DC-removed data.
+
+    in_place: remove DC and window data in its own buffer rather than in a
+    copy. data must then be a writeable ndarray of the given dtype, and is
+    overwritten.
+    dtype: np.float32 halves the working memory for very long records, at
+    the cost of a higher numerical noise floor.
+    """
+    n = len(data)
+    if in_place:
+        if not isinstance(data, np.ndarray) or data.dtype != dtype or not data.flags.writeable:
+            raise ValueError("in_place needs a writeable ndarray of dtype " + np.dtype(dtype).name)
+    else:
+        data = np.array(data, dtype=dtype)
     data -= np.mean(data)
+    w = window(n, window_type, dtype)
+    if w is not None:
+        data *= w
+    n_by_2 = n // 2
+    fft_data = np.abs(np.fft.rfft(data))
+    fft_data /= n
+    fft_data[1:n_by_2] *= 2
+    return fft_data
+
+def windowed_fft_mag_batch(data, window_type=BLACKMAN_HARRIS_92):
+    data = np.array(data, dtype=np.float64, ndmin=2)
+    n = data.shape[-1]
+    data -= np.mean(data, axis=-1, keepdims=True)
     w = window(n, window_type)
     if w is not None:
-        data = data * w
-    n_by_2 = (int)(n/2)
-    fft_data = np.fft.fft(data)[0:n_by_2+1]
-    fft_data = abs(fft_data) / n
-    fft_data[1:n_by_2] *= 2     
+        data *= w
+    n_by_2 = n // 2
+    fft_data = np.abs(np.fft.rfft(data, axis=-1)) / n
+    fft_data[:, 1:n_by_2] *= 2
     return fft_data
 
 def find_harmonics(fft_data, max_harms):
+    harm_bins, harms, harm_bws = find_harmonics_batch(fft_data[np.newaxis, :], max_harms)
+    return (harm_bins[0], harms[0], harm_bws[0])
+
+def calculate_auto_mask(fft_data, harm_bins, window_type):
+    return calculate_auto_mask_batch(fft_data[np.newaxis, :], np.asarray(harm_bins)[np.newaxis, :],
+                                     window_type)[0]
+
+def find_harmonics_batch(fft_data, max_harms):
+    """find_harmonics() for an (n_records, n_bins) stack of spectra.
+
+    Loops over harmonics only; each step works on a handful of bins per
+    record instead of full-length masks. Returns (harm_bins, harms,
+    harm_bws), each shaped (n_records, max_harms).
+    """
     BW = 3
-    harm_bins = np.zeros(max_harms, dtype=int)
-    harms = np.zeros(max_harms)
-    harm_bws = np.zeros(max_harms, dtype=int)
-    
-    _, fund_bin = get_max(fft_data)
-    harm_bins[0] = fund_bin
-    
+    n_rec, n = fft_data.shape
+    rows = np.arange(n_rec)[:, np.newaxis]
+    harm_bins = np.zeros((n_rec, max_harms), dtype=int)
+    harms = np.zeros((n_rec, max_harms))
+    harm_bws = np.zeros((n_rec, max_harms), dtype=int)
+    band = np.arange(-BW, BW + 1)
+
+    fund_bin = np.argmax(fft_data, axis=1)
+    harm_bins[:, 0] = fund_bin
+
     for h in range(1, max_harms+1):
-        # first find the location by taking max in area of uncertainty
-        mask = init_mask(len(fft_data), False)
-        nominal_bin = h * fund_bin
-        h_2 = h / 2
+        prev = harm_bins[:, :h-1]
         if h > 1:
-            mask = set_mask(mask, nominal_bin - h_2, nominal_bin + h_2)
-            for i in range(h-1):
-                mask = clear_mask(mask, harm_bins[i], harm_bins[i])
-            _, harm_bins[h-1] = masked_max(fft_data, mask)
-    
-        mask = clear_mask(mask, nominal_bin-h_2, nominal_bin+h_2)
-        mask = set_mask(mask, harm_bins[h-1]-BW, harm_bins[h-1]+BW)
-        for i in range(h-1):
-            mask = clear_mask(mask, harm_bins[i]-BW, harm_bins[i]+BW)
-        harms[h-1], harm_bws[h-1] = masked_sum_of_sq(fft_data, mask)
-    return (harm_bins, harms, harm_bws)    
-        
-        
-def calculate_auto_mask(fft_data, harm_bins, window_type):
+            # Largest bin in the area of uncertainty around the nominal bin,
+            # skipping earlier harmonics and the Nyquist bin. Ties go to the
+            # lowest bin, as in masked_max.
+            nominal = (h * fund_bin)[:, np.newaxis]
+            bins = fold_bins(nominal + np.arange(-((h + 1) // 2), h // 2 + 1), n)
+            valid = (bins != n - 1) & ~(bins[:, :, np.newaxis] == prev[:, np.newaxis, :]).any(axis=2)
+            values = np.where(valid, fft_data[rows, bins], -np.inf)
+            best = valid & (values == values.max(axis=1, keepdims=True))
+            harm_bins[:, h-1] = np.where(best, bins, n).min(axis=1)
+
+        # Power in +/-BW around the harmonic, less bins already claimed by
+        # earlier harmonics, summed in ascending bin order
+        bins = np.sort(fold_bins(harm_bins[:, h-1:h] + band, n), axis=1)
+        claimed = fold_bins(prev[:, :, np.newaxis] + band, n).reshape(n_rec, 1, -1)
+        valid = (bins != n - 1) & ~(bins[:, :, np.newaxis] == claimed).any(axis=2)
+        valid[:, 1:] &= bins[:, 1:] != bins[:, :-1]
+        values = fft_data[rows, bins]
+        sq = np.where(valid, values * values, 0.0)
+        for k in range(sq.shape[1]):
+            harms[:, h-1] += sq[:, k]
+        harm_bws[:, h-1] = np.count_nonzero(valid, axis=1)
+    return (harm_bins, harms, harm_bws)
+
+def calculate_auto_mask_batch(fft_data, harm_bins, window_type):
+    """calculate_auto_mask() for an (n_records, n_bins) stack of spectra.
+
+    Works on intervals: the rough noise estimate sums the spectrum outside
+    a few merged bands, and each harmonic region is grown by scanning
+    outwards in doubling chunks until the first bin that stops it, instead
+    of a bin at a time.
+    """
     BANDWIDTH_DIVIDER = 80
     NUM_INITAL_NOISE_HARMS = 5
-    n = len(fft_data)
+    n_rec, n = fft_data.shape
     bw = n / BANDWIDTH_DIVIDER
 
-    mask = init_mask(n)
-    for i in range(NUM_INITAL_NOISE_HARMS):
-        clear_mask(mask, harm_bins[i] - bw, harm_bins[i] + bw)
-    mask[0] = False
+    # Rough noise estimate, leaving out +/-bw around the first harmonics,
+    # DC and the Nyquist bin (which masked_sum never includes)
+    bands = harm_bins[:, :NUM_INITAL_NOISE_HARMS]
+    starts, ends = fold_interval((bands - bw).astype(int), (bands + bw).astype(int), n)
+    edge_bins = np.tile([0, n - 1], (n_rec, 1))
+    starts = np.concatenate((starts, edge_bins), axis=1)
+    ends = np.concatenate((ends, edge_bins), axis=1)
+    order = np.argsort(starts, axis=1)
+    starts = np.take_along_axis(starts, order, axis=1)
+    ends = np.take_along_axis(ends, order, axis=1)
+    starts[:, 1:] = np.maximum(starts[:, 1:], np.maximum.accumulate(ends, axis=1)[:, :-1] + 1)
+    excluded = np.zeros(n_rec)
+    for r, i in zip(*np.nonzero(ends >= starts)):
+        excluded[r] += np.sum(fft_data[r, starts[r, i]:ends[r, i]+1])
+    noise_est = ((np.sum(fft_data, axis=1) - excluded) /
+                 (n - np.sum(np.maximum(ends - starts + 1, 0), axis=1)))
 
-    noise_est, noise_bins = masked_sum(fft_data, mask)
-    noise_est /= noise_bins
+    dc = window_type >> 4
+    num_harms = harm_bins.shape[1]
+    lows = np.full((n_rec, num_harms), n + 1)
+    highs = np.full((n_rec, num_harms), -1)
+    for i in range(num_harms):
+        h = harm_bins[:, i]
+        cleared = (h <= dc) | ((lows[:, :i] <= h[:, np.newaxis]) &
+                               (h[:, np.newaxis] <= highs[:, :i])).any(axis=1)
+        # Nearest cleared bins on either side bound the growth
+        wall_low = np.where(highs[:, :i] < h[:, np.newaxis], highs[:, :i], dc).max(axis=1, initial=dc)
+        wall_high = np.where(lows[:, :i] > h[:, np.newaxis], lows[:, :i], n).min(axis=1, initial=n)
+        low = _grow_region(fft_data, noise_est, h - 1, wall_low, -1) + 1
+        high = _grow_region(fft_data, noise_est, h + 1, wall_high, 1) - 1
+        lows[:, i] = np.where(cleared, n + 1, low)
+        highs[:, i] = np.where(cleared, -1, high)
 
-    mask = init_mask(n)
-    clear_mask_at_dc(mask, window_type)
-    for h in harm_bins:
-        if mask[h] == 0:
-            continue
-
-        j = 1
-        while ( h-j > 0 and mask[h-j] == 1 and 
-                sum(fft_data[(h-j):(h-j+3)]) / 3 > noise_est ):
-            j += 1
-        low = h - j + 1
-
-        j = 1
-        while ( h+j < n and mask[h+j] == 1 and 
-                sum(fft_data[(h+j-2):(h+j+1)]) / 3 > noise_est ) :
-            j += 1
-        high = h + j - 1
-
-        clear_mask(mask, low, high)
-    
+    mask = np.ones((n_rec, n), dtype=bool)
+    mask[:, :dc+1] = False
+    for r, i in zip(*np.nonzero(highs >= 0)):
+        mask[r, lows[r, i]:highs[r, i]+1] = False
     return mask
 
+def _grow_region(fft_data, noise_est, start, wall, step):
+    # Walks from start by step and returns the first bin that is at or past
+    # wall, or whose 3-bin average (starting two bins back when walking up)
+    # is not above noise_est.
+    n_rec, n = fft_data.shape
+    offset = 0 if step < 0 else -2
+    stop = np.zeros(n_rec, dtype=int)
+    pending = np.arange(n_rec)
+    done, chunk = 0, 16
+    while len(pending):
+        pos = start[pending, np.newaxis] + step * (done + np.arange(chunk))
+        first = pos + offset
+        total = np.zeros(pos.shape)
+        for k in range(3):
+            index = first + k
+            total = total + np.where(index < n, fft_data[pending[:, np.newaxis],
+                                                         np.clip(index, 0, n - 1)], 0.0)
+        hit = ((pos - wall[pending, np.newaxis]) * step >= 0) | ~(total / 3 > noise_est[pending, np.newaxis])
+        found = hit.any(axis=1)
+        stop[pending[found]] = pos[found, np.argmax(hit[found], axis=1)]
+        pending = pending[~found]
+        done, chunk = done + chunk, chunk * 2
+    return stop
+
 def find_spur(find_in_harms, fund_bin, harms, harm_bws, fft_data, window_type):
     if find_in_harms:
         spur, index = get_max(harms[1:])
@@ -217,27 +464,41 @@ def find_spur_in_data(fft_data, window_type, fund_bin):
     mask = init_mask(n)
     mask = clear_mask_at_dc(mask, window_type)
     mask = clear_mask(mask, fund_bin - BW, fund_bin + BW)
-    
-    index = 0    
-    for i, v in enumerate(mask):
-        if v:
-            index = i
-            break
-            
-    max_value = masked_sum_of_sq(fft_data, mask, index - BW, index + BW);
-    max_index = index;
-    
-    while index < len(fft_data):
-        if mask[index]:
-            value = masked_sum_of_sq(fft_data, mask, index - BW, index + BW)
-            if value > max_value:
-                max_value = value
-                max_index = index
-        index += 1
+
+    # Score every unmasked bin at once instead of calling masked_sum_of_sq
+    # bin by bin. The winner is the first bin with the largest (sum, count)
+    # pair, which is how the original scan compared its tuples.
+    candidates = np.flatnonzero(mask)
+    sums, counts = sliding_masked_sum_of_sq(fft_data, mask, BW)
+    sums = sums[candidates]
+    counts = counts[candidates]
+    ties = np.where(sums == sums.max(), counts, -1)
+    max_index = candidates[np.argmax(ties)]
+
     _, spur_bin = masked_max(fft_data, mask, max_index - BW, max_index + BW)
     spur, spur_bw = masked_sum_of_sq(fft_data, mask, spur_bin - BW, spur_bin + BW)
     return (spur, spur_bw)
 
+def sliding_masked_sum_of_sq(data, mask, bw):
+    """Masked sum of squares over the window [i-bw, i+bw) for every bin i.
+
+    Equivalent to calling masked_sum_of_sq(data, mask, i-bw, i+bw) for each
+    bin, including the Nyquist folding at both ends, but done with 2*bw
+    shifted array adds. Terms are accumulated in the same order as the
+    per-bin call so the sums are bit-identical.
+    Returns (sums, counts), one entry per bin.
+    """
+    n = len(data)
+    folded = map_nyquist(np.arange(-bw, n + bw - 1), n - 1)
+    masked_sq = np.where(mask, data * data, 0.0)[folded]
+    masked_cnt = mask.astype(int)[folded]
+    sums = np.zeros(n)
+    counts = np.zeros(n, dtype=int)
+    for offset in range(2 * bw):
+        sums += masked_sq[offset:offset + n]
+        counts += masked_cnt[offset:offset + n]
+    return sums, counts
+
 def clear_mask_at_dc(mask, window_type):
     return clear_mask(mask, 0, window_type >> 4)
 
@@ -248,13 +509,36 @@ def init_mask(n, initial_value=True):
         return np.zeros(n, dtype = bool)
 
 def set_mask(mask, start, end, set_value=True):
-    nyq = len(mask)
-    mask[map_nyquist(np.array(range(int(start), int(end)+1)), nyq)] = set_value
+    mask[fold_bins(np.arange(int(start), int(end)+1), len(mask))] = set_value
     return mask
 
 def clear_mask(mask, start, end):
     return set_mask(mask, start, end, False)
 
+def fold_bins(indices, n_bins):
+    """Fold bin indices back into 0..n_bins-1 around DC and Nyquist."""
+    n = 2 * (n_bins - 1)
+    indices = np.mod(indices, n)
+    return np.where(indices > n_bins - 1, n - indices, indices)
+
+def fold_interval(start, end, n_bins):
+    """Folds bin intervals [start, end] back into 0..n_bins-1.
+
+    Intervals must be shorter than 2*(n_bins-1). Returns (starts, ends)
+    with three pieces per interval along the last axis; unused pieces
+    have start > end.
+    """
+    n = 2 * (n_bins - 1)
+    shift = np.floor_divide(start, n) * n
+    start = start - shift
+    end = end - shift
+    starts = np.stack((start, np.maximum(start, n_bins), np.maximum(start, n) - n), axis=-1)
+    ends = np.stack((np.minimum(end, n_bins - 1), np.minimum(end, n - 1), end - n), axis=-1)
+    # The middle piece lies past Nyquist and is mirrored
+    starts[..., 1], ends[..., 1] = n - ends[..., 1], n - starts[..., 1]
+    shape = start.shape[:-1] + (-1,)
+    return starts.reshape(shape), ends.reshape(shape)
+
 def map_nyquist(indices, nyq):
     n = 2 * (nyq - 1)
     indices = np.mod(indices + n, n)
@@ -299,3 +583,5 @@ def get_max(data):
     index = np.argmax(data)
     return (data[index], index)
 
+if os.environ.get("SIN_PARAMS_PRECOMPUTE"):
+    precompute_windows()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2016-2019 Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+"""
+Round-trip fuzz tests for the AvalonMM packet encoder and decoder.
+
+Random payloads are built to contain every byte either stuffing layer
+escapes (0x4A, 0x4D, 0x7A-0x7D), plus headers whose size and address
+fields hit them too. Every packet must decode back to its header and
+payload.
+
+Run from this directory with:
+    python -m pytest test_AvalonMM_packets.py
+"""
+
+import random
+
+import pytest
+
+import AvalonMM_packets as av_pack
+
+SPECIAL_BYTES = [av_pack.CONST_SOP, av_pack.CONST_EOP, av_pack.CONST_CHANNEL,
+                 av_pack.CONST_ESC, av_pack.CONST_BYTES_IDLE_CHAR,
+                 av_pack.CONST_BYTES_ESC_CHAR]
+TRANS_TYPES = [av_pack.CONST_SEQUENTIAL_WRITE, av_pack.CONST_NON_SEQUENTIAL_WRITE,
+               av_pack.CONST_SEQUENTIAL_READ, av_pack.CONST_NON_SEQUENTIAL_READ]
+NUM_FUZZ_CASES = 500
+
+def header(trans_type, size, address):
+    return [trans_type, 0, (size>>8) & 0xFF, size & 0xFF, (address>>24) & 0xFF,
+            (address>>16) & 0xFF, (address>>8) & 0xFF, address & 0xFF]
+
+def random_field(rng, num_bytes):
+    # Mostly special bytes, so escapes land next to each other and at the ends
+    value = 0
+    for _ in range(num_bytes):
+        byte = rng.choice(SPECIAL_BYTES) if rng.random() < 0.5 else rng.randrange(256)
+        value = (value << 8) | byte
+    return value
+
+def random_payload(rng):
+    payload = SPECIAL_BYTES + [rng.randrange(256) for _ in range(rng.randrange(64))]
+    payload += [rng.choice(SPECIAL_BYTES) for _ in range(rng.randrange(16))]
+    rng.shuffle(payload)
+    return payload
+
+@pytest.mark.parametrize('seed', range(NUM_FUZZ_CASES))
+def test_write_round_trip(seed):
+    rng = random.Random(seed)
+    payload = random_payload(rng)
+    trans_type = rng.choice(TRANS_TYPES[:2])
+    address = random_field(rng, 4)
+    packet = av_pack.create_packet(trans_type, len(payload), address, payload)
+    assert packet[:3] == [av_pack.CONST_SOP, av_pack.CONST_CHANNEL, 0]
+    assert av_pack.CONST_EOP in packet
+    expected = header(trans_type, len(payload), address) + payload
+    assert av_pack.packet_to_data(packet) == expected
+    assert av_pack.decode_packet(av_pack.encode_packet(trans_type, len(payload), address,
+                                                       payload)) == bytearray(expected)
+
+@pytest.mark.parametrize('seed', range(NUM_FUZZ_CASES))
+def test_read_round_trip(seed):
+    rng = random.Random(seed)
+    trans_type = rng.choice(TRANS_TYPES[2:])
+    size = random_field(rng, 2)
+    address = random_field(rng, 4)
+    packet = av_pack.create_packet(trans_type, size, address)
+    assert av_pack.packet_to_data(packet) == header(trans_type, size, address)
+
+@pytest.mark.parametrize('seed', range(NUM_FUZZ_CASES))
+def test_frame_round_trip(seed):
+    # Responses are framed the same way; bodies of any length, including
+    # one that is a single escaped byte
+    rng = random.Random(seed)
+    body = random_payload(rng)[:rng.randrange(1, 80)]
+    assert av_pack.decode_packet(av_pack.encode_frame(body)) == bytearray(body)
+
+def test_known_packets():
+    # Produced by the original list-based create_packet
+    assert av_pack.create_packet(0x04, 4, 0x7A4A7D7B, [0x4D, 0x7C, 0x01, 0x7D]) == \
+        [122, 124, 0, 4, 0, 0, 4, 125, 90, 77, 106, 125, 93, 125, 91, 77, 109,
+         125, 92, 1, 123, 125, 93]
+    assert av_pack.create_packet(0x14, 4, 0x00001000) == \
+        [122, 124, 0, 20, 0, 0, 4, 0, 0, 16, 123, 0]
+
+def test_empty_response():
+    assert av_pack.packet_to_data([]) == [0, 0, 0, 0, 0, 0, 0, 0]
+
+@pytest.mark.parametrize('tail', [av_pack.CONST_ESC, av_pack.CONST_CHANNEL,
+                                  av_pack.CONST_BYTES_ESC_CHAR])
+def test_truncated_escape(tail):
+    with pytest.raises(ValueError):
+        av_pack.decode_packet([av_pack.CONST_SOP, av_pack.CONST_CHANNEL, 0, 0x01, tail])
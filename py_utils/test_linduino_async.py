@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2016-2019 Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+
+"""
+Round trips through the loopback Linduino for both transports: AsyncLinduino
+over LoopbackLinduino, and connect_to_linduino.Linduino / AsyncLinduino
+opening a PtyLinduino by port name (POSIX only).
+
+Run from this directory with:
+    python -m pytest test_linduino_async.py
+"""
+
+import asyncio
+import os
+
+import pytest
+
+import AvalonMM_packets as av_pack
+import connect_to_linduino as duino
+import linduino_async
+import linduino_loopback as loopback
+
+def dc590_command(trans_type, size, base, data = None):
+    # DC590 string for one Avalon transaction and its response length
+    command = av_pack.encode_DC590(av_pack.encode_packet(trans_type, size, base, data),
+                                   4 if data is not None else size)
+    return command, 2 * command.count('R')
+
+async def write_then_read(linduino, base, data):
+    write, write_length = dc590_command(av_pack.CONST_SEQUENTIAL_WRITE, len(data), base, data)
+    read, read_length = dc590_command(av_pack.CONST_SEQUENTIAL_READ, len(data), base)
+    ack = await linduino.transfer_packets(write, write_length)
+    response = await linduino.transfer_packets(read, read_length)
+    return (av_pack.packet_to_data(av_pack.DC590_to_packet(ack)),
+            av_pack.packet_to_data(av_pack.DC590_to_packet(response)))
+
+def test_async_loopback_round_trip():
+    async def main():
+        async with linduino_async.AsyncLinduino(loopback.LoopbackLinduino()) as a, \
+                   linduino_async.AsyncLinduino(loopback.LoopbackLinduino()) as b:
+            ids = await asyncio.gather(a.transfer_packets('i', len(loopback.ID_STRING)),
+                                       b.transfer_packets(b'i', len(loopback.ID_STRING)))
+            results = await asyncio.gather(write_then_read(a, 0x10, [1, 2, 3, 4]),
+                                           write_then_read(b, 0x10, [0x7D, 0x4A, 0x4D, 0x7A]))
+            none = await a.transfer_packets('G')
+        return ids, results, none
+    ids, results, none = asyncio.run(main())
+    assert ids == [loopback.ID_STRING] * 2
+    assert results == [([0x84, 0, 0, 4], [1, 2, 3, 4]),
+                       ([0x84, 0, 0, 4], [0x7D, 0x4A, 0x4D, 0x7A])]
+    assert none is None
+
+def test_async_loopback_timeout():
+    async def main():
+        async with linduino_async.AsyncLinduino(loopback.LoopbackLinduino(), timeout = 0.05) as a:
+            with pytest.raises(TimeoutError):
+                await a.transfer_packets('i', len(loopback.ID_STRING) + 1)
+            # The leftover bytes are dropped before the next request
+            return await a.transfer_packets('i', len(loopback.ID_STRING))
+    assert asyncio.run(main()) == loopback.ID_STRING
+
+@pytest.fixture
+def pty_linduino(tmp_path, monkeypatch):
+    if os.name != 'posix':
+        pytest.skip("pseudo-terminals are POSIX only")
+    # Keep the port cache out of the home directory
+    monkeypatch.setattr(duino, 'CACHE_FILE', str(tmp_path / 'linduino_port.json'))
+    with loopback.PtyLinduino() as pty:
+        yield pty
+
+def test_pty_round_trip(pty_linduino):
+    linduino = duino.Linduino(pty_linduino.port_name)
+    try:
+        assert linduino.port is not None
+        command, length = dc590_command(av_pack.CONST_SEQUENTIAL_WRITE, 4, 0x20, [5, 6, 7, 8])
+        assert av_pack.packet_to_data(av_pack.DC590_to_packet(
+            linduino.transfer_packets(command, length))) == [0x84, 0, 0, 4]
+        assert pty_linduino.loopback.memory[0x20:0x24] == bytearray([5, 6, 7, 8])
+    finally:
+        linduino.close()
+
+def test_pty_async_round_trip(pty_linduino):
+    async def main():
+        async with await linduino_async.AsyncLinduino.open(pty_linduino.port_name) as a:
+            linduino_id = await a.transfer_packets('i', len(loopback.ID_STRING))
+            return linduino_id, await write_then_read(a, 0x30, [9, 0x4D, 0x7D, 10])
+    linduino_id, result = asyncio.run(main())
+    assert linduino_id == loopback.ID_STRING
+    assert result == ([0x84, 0, 0, 4], [9, 0x4D, 0x7D, 10])
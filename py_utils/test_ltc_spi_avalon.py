@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2016-2019 Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+
+"""
+Tests for TransactionQueue against the loopback Linduino: responses come
+back in the order the transactions were queued, short responses time out
+with IOError, and serial port errors reach every future in the batch.
+
+Run from this directory with:
+    python -m pytest test_ltc_spi_avalon.py
+"""
+
+import pytest
+
+import linduino_loopback as loopback
+import ltc_spi_avalon as avalon
+
+WRITE_ACK = [0x84, 0, 0, 4]     # Sequential write response for 4 bytes
+
+# Loopback whose port loses everything after the first keep characters
+class ShortLinduino(loopback.LoopbackLinduino):
+
+    def __init__(self, keep):
+        loopback.LoopbackLinduino.__init__(self)
+        port_read = self.port.read
+        self.sent = 0
+        def read(size = 1):
+            data = port_read(size)[:max(keep - self.sent, 0)]
+            self.sent += len(data)
+            return data
+        self.port.read = read
+
+# Loopback whose port fails on write
+class BrokenLinduino(loopback.LoopbackLinduino):
+
+    def __init__(self):
+        loopback.LoopbackLinduino.__init__(self)
+        def write(data):
+            raise IOError("port went away")
+        self.port.write = write
+
+def test_results_in_queue_order():
+    linduino = loopback.LoopbackLinduino()
+    with avalon.TransactionQueue(linduino) as queue:
+        futures = [queue.write(0x10, 4, [0x01, 0x02, 0x03, 0x04]),
+                   queue.read(0x10, 4),
+                   queue.write(0x12, 4, [0x7D, 0x7A, 0x4A, 0x4D]),
+                   queue.read(0x10, 6),
+                   queue.read(0x14, 2)]
+        assert not any(future.done() for future in futures)
+    assert [future.result() for future in futures] == [
+        WRITE_ACK,
+        [0x01, 0x02, 0x03, 0x04],
+        WRITE_ACK,
+        [0x01, 0x02, 0x7D, 0x7A, 0x4A, 0x4D],
+        [0x4A, 0x4D]]
+    assert linduino.port.writes == 1
+
+def test_max_batch_flushes():
+    linduino = loopback.LoopbackLinduino()
+    queue = avalon.TransactionQueue(linduino, max_batch = 2)
+    first = queue.write(0x20, 4, [9, 8, 7, 6])
+    assert not first.done()
+    second = queue.read(0x20, 4)
+    assert first.result() == WRITE_ACK
+    assert second.result() == [9, 8, 7, 6]
+    third = queue.read(0x22, 2)
+    assert not third.done()
+    queue.flush()
+    assert third.result() == [7, 6]
+    assert linduino.port.writes == 2
+
+def test_flush_with_nothing_queued():
+    linduino = loopback.LoopbackLinduino()
+    avalon.TransactionQueue(linduino).flush()
+    assert linduino.port.writes == 0
+
+def test_short_response_times_out(monkeypatch):
+    monkeypatch.setattr(avalon.TransactionQueue, 'RESPONSE_TIMEOUT', 0.05)
+    # Keep the whole first response and lose the second
+    command = avalon.av_pack.encode_DC590(
+        avalon.av_pack.encode_packet(avalon.av_pack.CONST_SEQUENTIAL_READ, 4, 0x30), 4)
+    queue = avalon.TransactionQueue(ShortLinduino(2 * command.count('R')))
+    complete = queue.read(0x30, 4)
+    truncated = queue.read(0x30, 4)
+    queue.flush()
+    assert complete.result() == [0, 0, 0, 0]
+    with pytest.raises(IOError, match = "response ended"):
+        truncated.result()
+
+def test_deadline_uses_monotonic_clock(monkeypatch):
+    # A port that never answers: the loop must end on the clock alone
+    now = [100.0]
+    def clock():
+        now[0] += 0.25
+        return now[0]
+    monkeypatch.setattr(avalon, '_clock', clock)
+    linduino = ShortLinduino(0)
+    queue = avalon.TransactionQueue(linduino)
+    future = queue.read(0, 4)
+    queue.flush()
+    with pytest.raises(IOError):
+        future.result()
+    assert 100.0 < now[0] < 102.0
+
+def test_port_error_reaches_every_future():
+    queue = avalon.TransactionQueue(BrokenLinduino())
+    futures = [queue.write(0x40, 4, [1, 2, 3, 4]), queue.read(0x40, 4)]
+    with pytest.raises(IOError, match = "port went away"):
+        queue.flush()
+    for future in futures:
+        with pytest.raises(IOError, match = "port went away"):
+            future.result()
+    # The failed batch is not sent again
+    queue.flush()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# ---------------------------------------------------------------------------
+# Copyright (c) 2016-2019 Analog Devices, Inc. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# - Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+# - Modified versions of the software must be conspicuously marked as such.
+# - This software is licensed solely and exclusively for use with
+#   processors/products manufactured by or for Analog Devices, Inc.
+# - This software may not be combined or merged with other code in any manner
+#   that would cause the software to become subject to terms and conditions
+#    which differ from those listed here.
+# - Neither the name of Analog Devices, Inc. nor the names of its contributors
+#   may be used to endorse or promote products derived from this software
+#   without specific prior written permission.
+# - The use of this software may or may not infringe the patent rights of one
+#   or more patent holders. This license does not release you from the
+#   requirement that you obtain separate licenses from these patent holders
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT;
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# 2019-01-10-7CBSD SLA
+# -----------------------------------------------------------------------
+
+"""
+Tests that save_for_pscope and PscopeWriter write exactly what the original
+per-sample writer did, including integer extremes (int64 min, uint64 values
+of 2**63 and above) and float types.
+
+Run from this directory with:
+    python -m pytest test_save_for_pscope.py
+"""
+
+import numpy as np
+import pytest
+
+import save_for_pscope as sfp
+
+def baseline_save_for_pscope(out_path, num_bits, is_bipolar, num_samples, dc_num, ltc_num, *data):
+    # The writer as it was before the block formatter
+    num_channels = len(data)
+    full_scale = 1 << num_bits
+    if is_bipolar:
+        min_val = -full_scale // 2
+        max_val = full_scale // 2
+    else:
+        min_val = 0
+        max_val = full_scale
+
+    with open(out_path, 'w') as out_file:
+        out_file.write('Version,115\n')
+        out_file.write('Retainers,0,{0:d},{1:d},1024,0,{2:0.15f},1,1\n'.format(num_channels, num_samples, 0.0))
+        out_file.write('Placement,44,0,1,-1,-1,-1,-1,10,10,1031,734\n')
+        out_file.write('DemoID,' + dc_num + ',' + ltc_num + ',0\n')
+        for i in range(num_channels):
+            out_file.write(
+                'RawData,{0:d},{1:d},{2:d},{3:d},{4:d},{5:0.15f},{3:e},{4:e}\n'.format(
+                    i+1, int(num_samples), int(num_bits), min_val, max_val, 1.0 ))
+        for samp in range(num_samples):
+            out_file.write(str(data[0][samp]))
+            for ch in range(1, num_channels):
+                out_file.write(', ,' + str(data[ch][samp]))
+            out_file.write('\n')
+        out_file.write('End\n')
+
+def channel(dtype, num_samples=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu':
+        info = np.iinfo(dtype)
+        data = rng.integers(info.min, info.max, num_samples, dtype=dtype, endpoint=True)
+        data[:4] = [info.min, info.max, 0, info.max // 2 + 1]
+        return data
+    if dtype.kind == 'b':
+        return rng.random(num_samples) < 0.5
+    exponents = rng.integers(-8, 9 if dtype.itemsize > 2 else 4, num_samples)
+    data = (rng.standard_normal(num_samples) * 10.0**exponents).astype(dtype)
+    data[:4] = [0.0, -0.0, 0.1, np.finfo(dtype).max]
+    return data
+
+DTYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32, np.int64,
+          np.uint64, np.bool_, np.float16, np.float32, np.float64]
+
+def read(path):
+    with open(str(path)) as f:
+        return f.read()
+
+@pytest.mark.parametrize('dtype', DTYPES, ids=lambda dtype: np.dtype(dtype).name)
+def test_matches_baseline(tmp_path, dtype):
+    channels = [channel(dtype, seed=seed) for seed in range(3)]
+    sfp.save_for_pscope(tmp_path / 'new.adc', 18, True, 1000, 'DC2222', 'LTC2222', *channels)
+    baseline_save_for_pscope(tmp_path / 'old.adc', 18, True, 1000, 'DC2222', 'LTC2222', *channels)
+    assert read(tmp_path / 'new.adc') == read(tmp_path / 'old.adc')
+
+def test_integer_extremes(tmp_path):
+    int64 = np.iinfo(np.int64)
+    channels = [np.array([int64.min, int64.max, -1, 0], dtype=np.int64),
+                np.array([2**63, 2**64 - 1, 2**63 - 1, 0], dtype=np.uint64)]
+    sfp.save_for_pscope(tmp_path / 'new.adc', 16, False, 4, 'DC0000', 'LTC1111', *channels)
+    rows = read(tmp_path / 'new.adc').splitlines()[-5:-1]
+    assert rows == ['-9223372036854775808, ,9223372036854775808',
+                    '9223372036854775807, ,18446744073709551615',
+                    '-1, ,9223372036854775807',
+                    '0, ,0']
+
+def test_lists_and_mixed_channels(tmp_path):
+    channels = [list(range(-500, 1500)), np.arange(2000, dtype=np.int32) * 3,
+                [float(x) / 7 for x in range(2000)]]
+    sfp.save_for_pscope(tmp_path / 'new.adc', 16, True, 2000, 'DC0000', 'LTC1111', *channels)
+    baseline_save_for_pscope(tmp_path / 'old.adc', 16, True, 2000, 'DC0000', 'LTC1111', *channels)
+    assert read(tmp_path / 'new.adc') == read(tmp_path / 'old.adc')
+
+def test_writes_first_num_samples_only(tmp_path):
+    channels = [np.arange(100), np.arange(200)]
+    sfp.save_for_pscope(tmp_path / 'new.adc', 16, True, 50, 'DC0000', 'LTC1111', *channels)
+    baseline_save_for_pscope(tmp_path / 'old.adc', 16, True, 50, 'DC0000', 'LTC1111', *channels)
+    assert read(tmp_path / 'new.adc') == read(tmp_path / 'old.adc')
+
+def test_short_channel(tmp_path):
+    with pytest.raises(ValueError):
+        sfp.save_for_pscope(tmp_path / 'new.adc', 16, True, 100, 'DC0000', 'LTC1111',
+                            np.arange(100), np.arange(99))
+    assert not (tmp_path / 'new.adc').exists()
+
+def test_pscope_writer_matches(tmp_path, monkeypatch):
+    monkeypatch.setattr(sfp, 'BLOCK_ROWS', 64)
+    channels = [channel(np.int32, 1000, seed) for seed in range(2)]
+    with sfp.PscopeWriter(tmp_path / 'new.adc', 20, False, 2, 'DC0000', 'LTC1111') as writer:
+        for start in range(0, 1000, 300):
+            writer.write(*[ch[start:start + 300] for ch in channels])
+    baseline_save_for_pscope(tmp_path / 'old.adc', 20, False, 1000, 'DC0000', 'LTC1111', *channels)
+    assert read(tmp_path / 'new.adc') == read(tmp_path / 'old.adc')
@@ -0,0 +1,145 @@
+# --------------------LICENSE AGREEMENT----------------------------------------
+# Copyright (c) 2020 Analog Devices, Inc.  All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+#   - Redistributions of source code must retain the above copyright notice, 
+#   this list of conditions and the following disclaimer.
+#   - Redistributions in binary form must reproduce the above copyright notice, 
+#   this list of conditions and the following disclaimer in the documentation 
+#   and/or other materials provided with the distribution.  
+#   - Modified versions of the software must be conspicuously marked as such.
+#   - This software is licensed solely and exclusively for use with 
+#   processors/products manufactured by or for Analog Devices, Inc.
+#   - This software may not be combined or merged with other code in any manner 
+#   that would cause the software to become subject to terms and conditions 
+#   which differ from those listed here.
+#   - Neither the name of Analog Devices, Inc. nor the names of its 
+#   contributors may be used to endorse or promote products derived from this 
+#   software without specific prior written permission.
+#   - The use of this software may or may not infringe the patent rights of  
+#   one or more patent holders.  This license does not release you from the 
+#   requirement that you obtain separate licenses from these patent holders 
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, 
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR  
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR 
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT; 
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; 
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR  
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# 2020-02-24-7CBSD SLA
+# -----------------------------------------------------------------------------
+
+"""
+Regression tests for the harmonic search and auto noise mask in sin_params.
+
+test_data/sin_params_corpus.npz holds 150 spectra (64 to 1024 point
+records, five window types, 5 to 40 harmonics, some quantized so that bins
+tie) together with the harm_bins, harms, harm_bws and auto masks that the
+per-harmonic full-mask implementation returned for them. That
+implementation raised on one of the spectra when building the mask, so
+that case only checks the harmonics.
+
+Run from this directory with:
+    python -m pytest test_sin_params.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import sin_params as sp
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'test_data', 'sin_params_corpus.npz')
+
+def load_corpus():
+    corpus = np.load(CORPUS)
+    bin_ends = np.cumsum(corpus['num_bins'])
+    harm_ends = np.cumsum(corpus['num_harms'])
+    spectra = np.split(corpus['spectra'], bin_ends[:-1])
+    masks = np.split(np.unpackbits(corpus['masks'], count=bin_ends[-1]).astype(bool),
+                     bin_ends[:-1])
+    harm_bins, harms, harm_bws = [np.split(corpus[key], harm_ends[:-1])
+                                  for key in ('harm_bins', 'harms', 'harm_bws')]
+    return [dict(fft_data=spectra[i], window_type=int(corpus['window'][i]),
+                 num_harms=int(corpus['num_harms'][i]), harm_bins=harm_bins[i],
+                 harms=harms[i], harm_bws=harm_bws[i],
+                 mask=masks[i] if corpus['has_mask'][i] else None)
+            for i in range(len(spectra))]
+
+CASES = load_corpus()
+
+def check_harmonics(case, harm_bins, harms, harm_bws):
+    np.testing.assert_array_equal(harm_bins, case['harm_bins'])
+    np.testing.assert_allclose(harms, case['harms'], rtol=1e-12, atol=0)
+    np.testing.assert_array_equal(harm_bws, case['harm_bws'])
+
+@pytest.mark.parametrize('i', range(len(CASES)))
+def test_find_harmonics(i):
+    case = CASES[i]
+    check_harmonics(case, *sp.find_harmonics(case['fft_data'], case['num_harms']))
+
+@pytest.mark.parametrize('i', [i for i, case in enumerate(CASES) if case['mask'] is not None])
+def test_calculate_auto_mask(i):
+    case = CASES[i]
+    mask = sp.calculate_auto_mask(case['fft_data'], case['harm_bins'], case['window_type'])
+    np.testing.assert_array_equal(mask, case['mask'])
+
+def group_cases(key):
+    groups = {}
+    for case in CASES:
+        groups.setdefault(key(case), []).append(case)
+    return sorted(groups.items(), key=lambda item: item[0])
+
+def test_find_harmonics_batch():
+    # Each harmonic only depends on the ones before it, so one batch run
+    # with the most harmonics covers every case of that length
+    for n, cases in group_cases(lambda case: len(case['fft_data'])):
+        num_harms = max(case['num_harms'] for case in cases)
+        results = sp.find_harmonics_batch(np.stack([case['fft_data'] for case in cases]),
+                                          num_harms)
+        for r, case in enumerate(cases):
+            h = case['num_harms']
+            check_harmonics(case, *[result[r, :h] for result in results])
+
+def test_calculate_auto_mask_batch():
+    groups = group_cases(lambda case: (len(case['fft_data']), case['window_type'],
+                                       case['num_harms']))
+    for (n, window_type, num_harms), cases in groups:
+        cases = [case for case in cases if case['mask'] is not None]
+        if not cases:
+            continue
+        masks = sp.calculate_auto_mask_batch(np.stack([case['fft_data'] for case in cases]),
+                                             np.stack([case['harm_bins'] for case in cases]),
+                                             window_type)
+        for mask, case in zip(masks, cases):
+            np.testing.assert_array_equal(mask, case['mask'])
+
+def large_spectrum(n=2**22, fund_bin=12345):
+    # Noise floor with a fundamental and harmonics 2 to 9 above it
+    rng = np.random.default_rng(0)
+    fft_data = rng.random(n) * 1e-6
+    fft_data[fund_bin] = 1.0
+    for h in range(2, 10):
+        fft_data[h * fund_bin] = 1e-3 / h
+    return fft_data
+
+def test_large_spectrum():
+    # 4M bins and many harmonics
+    fund_bin = 12345
+    fft_data = large_spectrum(fund_bin=fund_bin)
+    harm_bins, harms, harm_bws = sp.find_harmonics(fft_data, 200)
+    assert harm_bins[0] == fund_bin
+    assert list(harm_bins[1:9]) == [h * fund_bin for h in range(2, 10)]
+    mask = sp.calculate_auto_mask(fft_data, harm_bins, sp.BLACKMAN_HARRIS_92)
+    assert not mask[fund_bin]
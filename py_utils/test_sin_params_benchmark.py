@@ -0,0 +1,108 @@
+# --------------------LICENSE AGREEMENT----------------------------------------
+# Copyright (c) 2020 Analog Devices, Inc.  All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met:
+#   - Redistributions of source code must retain the above copyright notice, 
+#   this list of conditions and the following disclaimer.
+#   - Redistributions in binary form must reproduce the above copyright notice, 
+#   this list of conditions and the following disclaimer in the documentation 
+#   and/or other materials provided with the distribution.  
+#   - Modified versions of the software must be conspicuously marked as such.
+#   - This software is licensed solely and exclusively for use with 
+#   processors/products manufactured by or for Analog Devices, Inc.
+#   - This software may not be combined or merged with other code in any manner 
+#   that would cause the software to become subject to terms and conditions 
+#   which differ from those listed here.
+#   - Neither the name of Analog Devices, Inc. nor the names of its 
+#   contributors may be used to endorse or promote products derived from this 
+#   software without specific prior written permission.
+#   - The use of this software may or may not infringe the patent rights of  
+#   one or more patent holders.  This license does not release you from the 
+#   requirement that you obtain separate licenses from these patent holders 
+#   to use this software.
+# 
+# THIS SOFTWARE IS PROVIDED BY ANALOG DEVICES, INC. AND CONTRIBUTORS "AS IS" 
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, 
+# NON-INFRINGEMENT, TITLE, MERCHANTABILITY AND FITNESS FOR A PARTICULAR  
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL ANALOG DEVICES, INC. OR 
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, PUNITIVE OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, 
+# DAMAGES ARISING OUT OF CLAIMS OF INTELLECTUAL PROPERTY RIGHTS INFRINGEMENT; 
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; 
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR  
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+# ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# 2020-02-24-7CBSD SLA
+# -----------------------------------------------------------------------------
+
+"""
+Throughput benchmarks for sin_params (needs pytest-benchmark).
+
+Times sin_params() on a quantized sine plus noise for record sizes from 4k
+to 16M points and several window types, and the harmonic search and auto
+mask on a 4M-bin spectrum. Save a baseline once, then compare later runs
+against it; the run fails if any case's mean time grows by more than the
+threshold:
+
+    python -m pytest test_sin_params_benchmark.py --benchmark-autosave
+    python -m pytest test_sin_params_benchmark.py --benchmark-compare \\
+        --benchmark-compare-fail=mean:20%
+
+Skip the benchmarks during normal test runs with --benchmark-skip.
+"""
+
+import numpy as np
+import pytest
+
+import sin_params as sp
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = [2**k for k in range(12, 25, 2)]    # 4k .. 16M
+WINDOW_TYPES = {'NONE': sp.NONE,
+                'HANN': sp.HANN,
+                'BLACKMAN_HARRIS_92': sp.BLACKMAN_HARRIS_92}
+ROUNDS = 3
+
+def make_signal(num_samples, num_bits=18, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_samples)
+    cycles = 1000.5 * num_samples / 65536       # not coherent, as in a real capture
+    data = 0.9 * 2**(num_bits-1) * np.sin(2*np.pi * cycles * t / num_samples)
+    data += 0.001 * 2**(num_bits-1) * np.sin(2*np.pi * 3 * cycles * t / num_samples)
+    data += rng.normal(0, 2, num_samples)
+    return np.round(data)
+
+def large_spectrum(n=2**22, fund_bin=12345):
+    rng = np.random.default_rng(0)
+    fft_data = rng.random(n) * 1e-6
+    fft_data[fund_bin] = 1.0
+    for h in range(2, 10):
+        fft_data[h * fund_bin] = 1e-3 / h
+    return fft_data
+
+@pytest.mark.parametrize('window_name', list(WINDOW_TYPES))
+@pytest.mark.parametrize('size', SIZES)
+def test_sin_params_throughput(benchmark, size, window_name):
+    data = make_signal(size)
+    benchmark.group = 'sin_params/' + window_name
+    benchmark.extra_info['num_samples'] = size
+    benchmark.pedantic(sp.sin_params, args=(data, WINDOW_TYPES[window_name]),
+                       rounds=ROUNDS, warmup_rounds=1)
+
+def test_find_harmonics_4m_bins(benchmark):
+    fft_data = large_spectrum()
+    harm_bins, _, _ = benchmark.pedantic(sp.find_harmonics, args=(fft_data, 200),
+                                         rounds=ROUNDS, warmup_rounds=1)
+    assert harm_bins[0] == 12345
+
+def test_calculate_auto_mask_4m_bins(benchmark):
+    fft_data = large_spectrum()
+    harm_bins, _, _ = sp.find_harmonics(fft_data, 200)
+    mask = benchmark.pedantic(sp.calculate_auto_mask,
+                              args=(fft_data, harm_bins, sp.BLACKMAN_HARRIS_92),
+                              rounds=ROUNDS, warmup_rounds=1)
+    assert not mask[12345]